@@ -1,17 +1,88 @@
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from bs4 import BeautifulSoup, SoupStrainer
 import re
+import threading
+import time
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from urllib.parse import urlparse
 import os
-from openpyxl import load_workbook
-from openpyxl.utils import get_column_letter
+from history_store import open_history_store
+from cached_io import read_excel_cached
+from instrumentation import pipeline_run, stage, record
+from page_cache import PageCache, CacheMiss
+
+HEADERS = {"User-Agent": "Mozilla/5.0"}
+
+# --- Concurrency settings ---
+MAX_WORKERS = 8                     # Concurrent fetches (and pooled connections)
+REQUESTS_PER_SECOND_PER_HOST = 2.0  # Politeness limit per host (0 disables)
+MAX_RETRIES = 3                     # Retries on connection errors / 429 / 5xx
+BACKOFF_FACTOR = 0.5                # Sleeps 0.5s, 1s, 2s, ... between retries
+REQUEST_TIMEOUT = 30                # Seconds
+
+FRESHNESS_WINDOW = timedelta(days=7)  # Don't re-scrape products newer than this
+
+
+def create_session(pool_size=MAX_WORKERS, retries=MAX_RETRIES, backoff_factor=BACKOFF_FACTOR):
+    """
+    Returns a requests.Session with a shared connection pool and retry/backoff.
+    Reusing one session avoids a new TCP/TLS handshake per product.
+    """
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=("GET",),
+        respect_retry_after_header=True,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.headers.update(HEADERS)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+class HostRateLimiter:
+    """Spaces out requests to the same host, shared across worker threads."""
+
+    def __init__(self, per_second=REQUESTS_PER_SECOND_PER_HOST):
+        self.interval = 1.0 / per_second if per_second else 0.0
+        self._next_slot = {}
+        self._lock = threading.Lock()
+
+    def wait(self, url):
+        if not self.interval:
+            return
+        host = urlparse(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.interval
+        delay = slot - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+
+PAGE_PARSER = "html.parser"  # "lxml" is faster if installed; verify with bench_extraction.py
+
+# Only these tags are needed for extraction; everything else is skipped at parse time
+PRODUCT_PAGE_STRAINER = SoupStrainer(["h1", "span"])
 
-def fetch_product_details(product_url):
-    headers = {"User-Agent": "Mozilla/5.0"}
-    response = requests.get(product_url, headers=headers)
-    response.raise_for_status()
-    soup = BeautifulSoup(response.text, "html.parser")
+
+def parse_product_page(html, fast=True, parser=PAGE_PARSER):
+    """
+    Extracts name, pack weight, unit price and overall price from a product page.
+    fast=True builds only the h1/span tags (same output as a full parse).
+    """
+    if fast:
+        soup = BeautifulSoup(html, parser, parse_only=PRODUCT_PAGE_STRAINER)
+    else:
+        soup = BeautifulSoup(html, parser)
 
     # --- Product name ---
     name_tag = soup.find("h1", class_="product-details__title")
@@ -22,7 +93,7 @@ def fetch_product_details(product_url):
     unit_span = soup.find("span", {"data-test": "product-details__unit-of-measurement"})
     if unit_span:
         text = unit_span.get_text(strip=True)
-        pack_match = re.match(r"([\d.,]+\s*[A-Z]+)", text)
+        pack_match = re.match(r"((?:\d+\s*X\s*)?[\d.,]+\s*[A-Z]+)", text)  # "500G", "6 X 330ML"
         if pack_match:
             pack_weight = pack_match.group(1)
         price_match = re.search(r"£\s*([\d.,]+)\s*/\s*([\d.,]+)\s*([A-Z]+)", text, re.IGNORECASE)
@@ -39,70 +110,169 @@ def fetch_product_details(product_url):
         if match:
             overall_price = float(match.group(1).replace(",", ""))
 
-    # --- Timestamp ---
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
     return {
         "name": product_name,
         "pack_weight": pack_weight,
         "overall_price": overall_price,
         "price_per_unit": unit_price,
         "unit": unit,
-        "scraped_at": timestamp
     }
 
 
+def _get(url, session=None, headers=None):
+    if session is None:
+        response = requests.get(url, headers={**HEADERS, **(headers or {})}, timeout=REQUEST_TIMEOUT)
+    else:
+        response = session.get(url, headers=headers, timeout=REQUEST_TIMEOUT)
+    response.raise_for_status()
+    return response
+
+
+def fetch_product_details(product_url, session=None, fast=True, cache=None):
+    """
+    Fetches and parses one product page. With a PageCache the raw page is
+    saved, and the request is conditional on the cached ETag/Last-Modified,
+    so an unchanged page comes back as a 304 and is parsed from the cache.
+    If the cached copy is gone, the page is fetched again in full.
+    """
+    start = time.perf_counter()
+    conditional = cache.conditional_headers(product_url) if cache is not None else {}
+    response = _get(product_url, session, conditional)
+    fetched = time.perf_counter()
+
+    # --- Timestamp ---
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+    if cache is None:
+        html = response.text
+    else:
+        try:
+            html = cache.store(product_url, response, timestamp)
+        except CacheMiss as e:
+            print(f"⚠️ {e}; fetching {product_url} again")
+            response = _get(product_url, session)
+            fetched = time.perf_counter()
+            html = cache.store(product_url, response, timestamp)
+    details = parse_product_page(html, fast=fast)
+    record("url", url=product_url, status=response.status_code, bytes=len(response.content),
+           fetch_s=round(fetched - start, 4), parse_s=round(time.perf_counter() - fetched, 4))
+
+    return {"url": product_url, **details, "scraped_at": timestamp}
+
+
+def fetch_all(urls, max_workers=MAX_WORKERS, per_host_rate=REQUESTS_PER_SECOND_PER_HOST,
+              retries=MAX_RETRIES, backoff_factor=BACKOFF_FACTOR, session=None, cache=None):
+    """
+    Fetches product details for many URLs concurrently over one pooled session.
+    Returns results in the same order as `urls`; failed URLs are reported and
+    come back as None.
+    """
+    urls = list(urls)
+    if session is None:
+        session = create_session(pool_size=max_workers, retries=retries, backoff_factor=backoff_factor)
+    limiter = HostRateLimiter(per_host_rate)
+
+    def _fetch(url):
+        limiter.wait(url)
+        try:
+            return fetch_product_details(url, session=session, cache=cache)
+        except (requests.RequestException, OSError, LookupError) as e:
+            # One bad page (network, or an unusable cache entry) never aborts the run
+            print(f"❌ Failed to fetch {url}: {e}")
+            record("url", url=url, status="error", error=str(e))
+            return None
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        results = list(pool.map(_fetch, urls))
+    elapsed = time.perf_counter() - start
+
+    fetched = sum(r is not None for r in results)
+    rate = fetched / elapsed if elapsed > 0 else 0.0
+    print(f"⚡ Fetched {fetched}/{len(urls)} pages in {elapsed:.1f}s ({rate:.1f} pages/s)")
+    return results
+
+
 # --- Input and Output Files ---
 input_file = "products.xlsx"
-output_file = "scraped_products.xlsx"
-
-# Load product list
-products = pd.read_excel(input_file)
-
-# Load existing history if available
-if os.path.exists(output_file):
-    history = pd.read_excel(output_file)
-else:
-    history = pd.DataFrame(columns=["name", "pack_weight", "overall_price", "price_per_unit", "unit", "scraped_at"])
-
-results = []
-
-for _, row in products.iterrows():
-    url = row["url"]
-    result = fetch_product_details(url)
-
-    # Check history for this product
-    product_history = history[history["name"] == result["name"]]
-    if not product_history.empty:
-        last_date_str = product_history["scraped_at"].max()
-        last_date = pd.to_datetime(last_date_str)
-        if datetime.now() - last_date < timedelta(days=7):
-            print(f"⏩ Skipping {result['name']} (last scraped {last_date.date()})")
+history_path = "scraped_products.sqlite"  # .sqlite/.db, .xlsx, or a Parquet directory
+history_change_only = False  # True: new .sqlite stores keep only price/pack changes (see history_store.py)
+legacy_output_file = "scraped_products.xlsx"  # Imported once into a new store
+page_cache_dir = "page_cache"  # Raw pages for conditional requests and replay ("" disables)
+
+
+def open_history(path=None, change_only=None):
+    """Opens the history store (default history_path), importing the legacy workbook into a new, empty store."""
+    path = path or history_path
+    store = open_history_store(path, change_only=history_change_only if change_only is None else change_only)
+    if len(store) == 0 and path != legacy_output_file and os.path.exists(legacy_output_file):
+        store.append(pd.read_excel(legacy_output_file))
+        print(f"📥 Imported {legacy_output_file} into {path}")
+    return store
+
+
+def is_fresh(last_date, now, window=FRESHNESS_WINDOW):
+    return last_date is not None and now - last_date < window
+
+
+def main(max_workers=MAX_WORKERS, per_host_rate=REQUESTS_PER_SECOND_PER_HOST):
+    """Scrapes products that aren't fresh; stages and per-URL timings are logged (see instrumentation.py)."""
+    with pipeline_run("scraper"):
+        _scrape(max_workers, per_host_rate)
+
+
+def _scrape(max_workers, per_host_rate):
+    # Load product list
+    with stage("load_products") as st:
+        products = read_excel_cached(input_file)
+        st.rows_out = len(products)
+
+    # Open the history store, importing the legacy workbook on first use
+    with stage("load_history") as st:
+        store = open_history()
+
+        # Last-scraped lookups, built once. Older history rows have no URL, so
+        # fall back to matching by name after the fetch for those.
+        now = datetime.now()
+        last_by_url = store.last_scraped("url")
+        last_by_name = store.last_scraped("name")
+        st.rows_out = len(last_by_url)
+
+    to_fetch = []
+    for url in products["url"]:
+        last_date = last_by_url.get(url)
+        if is_fresh(last_date, now):
+            print(f"⏩ Skipping {url} (last scraped {last_date.date()})")
+            continue
+        to_fetch.append(url)
+
+    results = []
+
+    with stage("fetch", rows_in=len(to_fetch)) as st:
+        cache = PageCache(page_cache_dir) if page_cache_dir else None
+        fetched = fetch_all(to_fetch, max_workers=max_workers, per_host_rate=per_host_rate, cache=cache)
+        st.rows_out = sum(result is not None for result in fetched)
+    for result in fetched:
+        if result is None:
             continue
 
-    results.append(result)
-
-# Save updated history and auto-fit columns
-if results:
-    new_data = pd.DataFrame(results)
-    updated_history = pd.concat([history, new_data], ignore_index=True)
-    updated_history.to_excel(output_file, index=False)
-
-    # Auto-fit columns using openpyxl
-    wb = load_workbook(output_file)
-    ws = wb.active
-    for col in ws.columns:
-        max_length = 0
-        col_letter = get_column_letter(col[0].column)
-        for cell in col:
-            try:
-                if cell.value:
-                    max_length = max(max_length, len(str(cell.value)))
-            except:
-                pass
-        ws.column_dimensions[col_letter].width = max_length + 2  # Add some padding
-    wb.save(output_file)
-
-    print(f"✅ Added {len(results)} new records to {output_file} with auto-fit columns")
-else:
-    print("ℹ️ No new data to add (all products scraped within the last 7 days).")
+        if result["url"] not in last_by_url:
+            last_date = last_by_name.get(result["name"])
+            if is_fresh(last_date, now):
+                print(f"⏩ Skipping {result['name']} (last scraped {last_date.date()})")
+                continue
+
+        results.append(result)
+
+    # Append only the new rows; export to Excel with history_store.py on demand
+    if results:
+        with stage("save", rows_in=len(results)) as st:
+            store.append(pd.DataFrame(results))
+            st.rows_out = len(results)
+        print(f"✅ Added {len(results)} new records to {history_path}")
+    else:
+        print("ℹ️ No new data to add (all products scraped within the last 7 days).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+# bench_extraction.py
+#
+# Benchmarks product-page extraction: full BeautifulSoup parse vs the
+# targeted h1/span parse used by Scraper.fetch_product_details.
+#
+# Usage: python bench_extraction.py [fixtures_dir] [repeats]
+# Put saved product pages (*.html) in fixtures_dir. If it has none, a
+# synthetic corpus is generated there first.
+
+import os
+import sys
+import glob
+import random
+import time
+from Scraper import parse_product_page
+
+FIXTURES_DIR = "fixtures/product_pages"
+
+
+def make_product_page(i, rng):
+    """Returns a synthetic product page shaped like the real ones (lots of markup around 3 targets)."""
+    name = f"Product {i} {rng.choice(['Semi Skimmed Milk', 'Cheddar', 'Bananas', 'Bread &amp; Butter'])}"
+    pack = rng.choice(["500G", "1KG", "2L", "6 X 330ML", "4PK"])
+    price = rng.randint(50, 1500) / 100
+    nav = "".join(
+        f'<li class="nav__item"><a href="/c/{n}"><span class="nav__label">Category {n}</span></a></li>'
+        for n in range(rng.randint(150, 300))
+    )
+    tiles = "".join(
+        f'<div class="tile"><img src="/img/{n}.jpg" alt="tile {n}"><span class="tile__price">£{n}.99</span>'
+        f'<p class="tile__desc">Recommended item {n} &amp; more</p></div>'
+        for n in range(rng.randint(50, 120))
+    )
+    title_extra = '<span class="badge">New</span>' if i % 5 == 0 else ""
+    unit_span = (
+        f'<span data-test="product-details__unit-of-measurement"> {pack} &pound;{price / 2:.2f}/1KG </span>'
+        if i % 7 else ""
+    )
+    price_span = f'<span class="base-price__regular price--large"> £{price:,.2f} </span>' if i % 11 else ""
+    return f"""<!DOCTYPE html>
+<html><head><title>{name}</title>
+<script>window.__STATE__ = {{"items": [{",".join(str(n) for n in range(2000))}]}};</script>
+<style>.nav__item {{ display: inline-block; }}</style></head>
+<body><header><ul class="nav">{nav}</ul></header>
+<main><section class="product-details">
+<h1 class="product-details__title heading"> {name} {title_extra}</h1>
+<div class="price-block">{unit_span}{price_span}</div>
+<!-- <span class="base-price__regular">£0.00</span> -->
+</section><section class="recommendations">{tiles}</section></main>
+<footer><p>&copy; Example Grocer</p></footer></body></html>"""
+
+
+def generate_fixtures(fixtures_dir, count=50, seed=42):
+    rng = random.Random(seed)
+    os.makedirs(fixtures_dir, exist_ok=True)
+    for i in range(count):
+        with open(os.path.join(fixtures_dir, f"product_{i:04d}.html"), "w", encoding="utf-8") as f:
+            f.write(make_product_page(i, rng))
+    print(f"📄 Generated {count} synthetic product pages in {fixtures_dir}")
+
+
+def load_fixtures(fixtures_dir):
+    pages = []
+    for path in sorted(glob.glob(os.path.join(fixtures_dir, "*.html"))):
+        with open(path, encoding="utf-8") as f:
+            pages.append((path, f.read()))
+    return pages
+
+
+def time_engine(pages, fast, repeats, parser="html.parser"):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _, html in pages:
+            parse_product_page(html, fast=fast, parser=parser)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(fixtures_dir=FIXTURES_DIR, repeats=3):
+    if not glob.glob(os.path.join(fixtures_dir, "*.html")):
+        generate_fixtures(fixtures_dir)
+    pages = load_fixtures(fixtures_dir)
+    total_mb = sum(len(html.encode("utf-8")) for _, html in pages) / 1e6
+    print(f"=== Extraction benchmark: {len(pages)} pages ({total_mb:.1f} MB) ===")
+
+    # Both engines must agree exactly before timing means anything
+    mismatches = [
+        path for path, html in pages
+        if parse_product_page(html, fast=True) != parse_product_page(html, fast=False)
+    ]
+    if mismatches:
+        raise SystemExit(f"❌ Fast extraction differs from full parse for: {mismatches}")
+    print("✅ Fast and full extraction give identical output on every page")
+
+    full = time_engine(pages, fast=False, repeats=repeats)
+    fast = time_engine(pages, fast=True, repeats=repeats)
+    print(f"Full parse:     {full:.3f}s ({len(pages) / full:.1f} pages/s)")
+    print(f"Targeted parse: {fast:.3f}s ({len(pages) / fast:.1f} pages/s)")
+    print(f"Speedup:        {full / fast:.2f}x")
+
+    # Optional faster backend, only worth switching to if it agrees too
+    try:
+        import lxml  # noqa: F401
+    except ImportError:
+        return
+    same = all(
+        parse_product_page(html, parser="lxml") == parse_product_page(html, fast=False)
+        for _, html in pages
+    )
+    lxml_fast = time_engine(pages, fast=True, repeats=repeats, parser="lxml")
+    print(f"Targeted lxml:  {lxml_fast:.3f}s ({len(pages) / lxml_fast:.1f} pages/s, "
+          f"{full / lxml_fast:.2f}x, {'identical' if same else 'DIFFERENT'} output)")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    main(args[0] if args else FIXTURES_DIR, int(args[1]) if len(args) > 1 else 3)
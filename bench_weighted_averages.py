@@ -0,0 +1,88 @@
+# bench_weighted_averages.py
+#
+# Benchmarks price_analysis_mock.calculate_weighted_averages against the
+# original two-pass groupby(...).apply implementation on synthetic
+# statement rows, after checking both return the same frame.
+#
+# Usage: python bench_weighted_averages.py [rows] [items]
+
+import sys
+import time
+import numpy as np
+import pandas as pd
+from price_analysis_mock import calculate_weighted_averages
+
+STATES = ["BOUGHT", "SOLD", "BOUGHT", "SOLD", "CANCELLED"]
+
+
+def legacy_weighted_averages(df):
+    """The original implementation: one Python call per (item, month) group per state."""
+    bought = df[df['state'] == 'BOUGHT']
+    sold = df[df['state'] == 'SOLD']
+
+    bought_monthly = (
+        bought
+        .groupby([bought['name_clean'], bought['date'].dt.to_period('M')])
+        .apply(lambda x: (x['price'] * x['quantity']).sum() / x['quantity'].sum())
+        .reset_index(name='weighted_avg_bought_price')
+    )
+
+    sold_monthly = (
+        sold
+        .groupby([sold['name_clean'], sold['date'].dt.to_period('M')])
+        .apply(lambda x: (x['price'] * x['quantity']).sum() / x['quantity'].sum())
+        .reset_index(name='weighted_avg_sold_price')
+    )
+
+    price_trends = pd.merge(bought_monthly, sold_monthly, on=['name_clean', 'date'], how='outer')
+    price_trends.rename(columns={'date': 'month'}, inplace=True)
+    price_trends['month'] = price_trends['month'].dt.to_timestamp()
+
+    return price_trends
+
+
+def make_statements(rows, items, seed=42):
+    """Synthetic cleaned statements: name_clean, date, state, price, quantity."""
+    rng = np.random.default_rng(seed)
+    names = np.array([f"item {i}" for i in range(items)])
+    start = np.datetime64("2023-01-01")
+    df = pd.DataFrame({
+        "name_clean": names[rng.integers(0, items, rows)],
+        "date": start + rng.integers(0, 730 * 24 * 60, rows).astype("timedelta64[m]"),
+        "state": np.array(STATES)[rng.integers(0, len(STATES), rows)],
+        "price": rng.integers(1, 100000, rows) / 100,
+        "quantity": rng.integers(1, 500, rows).astype(float),
+    })
+    # A few gaps, as in real exports
+    df.loc[df.sample(frac=0.001, random_state=seed).index, "price"] = np.nan
+    return df
+
+
+def time_it(func, df, repeats):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func(df)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(rows=1_000_000, items=2000, repeats=3):
+    df = make_statements(rows, items)
+    print(f"=== Weighted averages benchmark: {rows:,} rows, {items:,} items ===")
+
+    expected = legacy_weighted_averages(df)
+    result = calculate_weighted_averages(df)
+    pd.testing.assert_frame_equal(result, expected)
+    print(f"✅ Vectorized output matches the original ({len(result):,} item-months)")
+
+    legacy = time_it(legacy_weighted_averages, df, 1)
+    vectorized = time_it(calculate_weighted_averages, df, repeats)
+    print(f"groupby.apply: {legacy:.3f}s ({rows / legacy:,.0f} rows/s)")
+    print(f"Vectorized:    {vectorized:.3f}s ({rows / vectorized:,.0f} rows/s)")
+    print(f"Speedup:       {legacy / vectorized:.1f}x")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    main(int(args[0]) if args else 1_000_000, int(args[1]) if len(args) > 1 else 2000)
@@ -0,0 +1,250 @@
+# benchmark_suite.py
+#
+# Offline benchmark suite for the pipeline stages: receipt loading,
+# cleaning, lookup/code assignment and code merging, statement cleaning,
+# weighted averages, and product-page fetch + extraction. Each stage is
+# timed and its peak traced memory recorded at every size, and the
+# results are compared against a stored baseline.
+#
+# Usage:
+#   python benchmark_suite.py                      # 10k and 100k rows
+#   python benchmark_suite.py --sizes 10k,100k,1m  # include the 1M tier
+#   python benchmark_suite.py --save-baseline      # record the baseline
+# Synthetic inputs (see synthetic_data.py) are generated once into
+# bench_data/ and reused. Exits with status 1 if a stage regressed.
+
+import os
+import sys
+import json
+import time
+import glob
+import shutil
+import argparse
+import tempfile
+import tracemalloc
+import requests
+from requests.adapters import BaseAdapter
+
+import cached_io
+import synthetic_data
+from data_cleaner import load_receipts, clean_receipts_frame, create_lookup_table, merge_codes_by_item_clean
+from mock_cleaner import clean_mock_statements
+from price_analysis_mock import calculate_weighted_averages
+from code_registry import CodeRegistry
+from Scraper import fetch_product_details
+
+SIZES = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+DEFAULT_SIZES = "10k,100k"
+ROWS_PER_PAGE = 1000  # Product pages per size: rows / ROWS_PER_PAGE
+DATA_DIR = "bench_data"
+RESULTS_FILE = "bench_results/latest.json"
+BASELINE_FILE = "bench_results/baseline.json"
+TOLERANCE = 1.25  # A stage regresses if it is this many times slower (or larger) than baseline
+MIN_SECONDS = 0.1   # Stages faster than this are too noisy to flag
+REPEATS = 3         # Timed runs per stage (best is kept) ...
+REPEAT_BUDGET = 2.0 # ... while the stage has used less than this many seconds
+
+
+# ----------------------------------------
+# Offline page serving
+# ----------------------------------------
+class FixtureAdapter(BaseAdapter):
+    """requests transport adapter that serves http://fixtures/<name> from a directory."""
+
+    def __init__(self, fixtures_dir):
+        super().__init__()
+        self.fixtures_dir = fixtures_dir
+
+    def send(self, request, **kwargs):
+        response = requests.Response()
+        path = os.path.join(self.fixtures_dir, request.url.split("/")[-1])
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                response._content = f.read()
+            response.status_code = 200
+        else:
+            response._content = b""
+            response.status_code = 404
+        response.headers["Content-Type"] = "text/html; charset=utf-8"
+        response.encoding = "utf-8"
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self):
+        pass
+
+
+def fixture_session(fixtures_dir):
+    session = requests.Session()
+    session.mount("http://fixtures/", FixtureAdapter(fixtures_dir))
+    return session
+
+
+# ----------------------------------------
+# Inputs
+# ----------------------------------------
+def prepare_inputs(label, rows, data_dir=DATA_DIR):
+    """Generates (once) the workbooks and page fixtures for one size."""
+    os.makedirs(data_dir, exist_ok=True)
+    receipts = os.path.join(data_dir, f"receipts_{label}.xlsx")
+    statements = os.path.join(data_dir, f"statements_{label}.xlsx")
+    pages = os.path.join(data_dir, f"pages_{label}")
+    page_count = max(rows // ROWS_PER_PAGE, 10)
+
+    if not os.path.exists(receipts):
+        print(f"🧪 Generating {receipts} ({rows:,} rows)")
+        synthetic_data.write_receipts_workbook(receipts, rows)
+    if not os.path.exists(statements):
+        print(f"🧪 Generating {statements} ({rows:,} rows)")
+        synthetic_data.write_statements_workbook(statements, rows)
+    if len(glob.glob(os.path.join(pages, "*.html"))) != page_count:
+        print(f"🧪 Generating {page_count} product pages in {pages}")
+        shutil.rmtree(pages, ignore_errors=True)
+        synthetic_data.write_product_pages(pages, page_count)
+    return receipts, statements, pages
+
+
+# ----------------------------------------
+# Stages
+# ----------------------------------------
+def measure(func, memory=True, repeats=REPEATS):
+    """
+    Best wall time of up to `repeats` runs (slow stages run once), then one
+    more run under tracemalloc for peak traced memory in MB.
+    """
+    seconds, spent = float("inf"), 0.0
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        seconds, spent = min(seconds, elapsed), spent + elapsed
+        if spent >= REPEAT_BUDGET:
+            break
+    peak_mb = None
+    if memory:
+        tracemalloc.start()
+        func()
+        peak_mb = tracemalloc.get_traced_memory()[1] / 1e6
+        tracemalloc.stop()
+    return result, seconds, peak_mb
+
+
+def run_size(label, rows, memory=True, data_dir=DATA_DIR):
+    """Runs every stage on one input size; returns {stage: {seconds, peak_mb, rows}}."""
+    receipts_path, statements_path, pages_dir = prepare_inputs(label, rows, data_dir)
+    results = {}
+
+    def record(stage, func, rows_of=len):
+        result, seconds, peak_mb = measure(func, memory)
+        results[f"{label}/{stage}"] = {"seconds": round(seconds, 4), "peak_mb": peak_mb and round(peak_mb, 2),
+                                      "rows": rows_of(result)}
+        mem = f", peak {peak_mb:.1f} MB" if peak_mb is not None else ""
+        print(f"  {stage:<28} {seconds:8.3f}s{mem}")
+        return result
+
+    print(f"\n=== {label}: {rows:,} rows ===")
+    with tempfile.TemporaryDirectory() as tmp:
+        # Excel parse without the Parquet sidecar, then the cached re-read
+        cached_io.CACHE_ENABLED = False
+        raw = record("receipts.load_excel", lambda: load_receipts(receipts_path))
+        cached_io.CACHE_ENABLED = True
+        load_receipts(receipts_path)  # Build the cache
+        record("receipts.load_cached", lambda: load_receipts(receipts_path))
+
+        clean = record("receipts.clean", lambda: clean_receipts_frame(raw.copy()))
+
+        def lookup():
+            path = os.path.join(tmp, f"lookup_{time.perf_counter_ns()}.sqlite")
+            with CodeRegistry(path) as registry:
+                return create_lookup_table(clean.copy(), registry=registry)
+        record("receipts.lookup", lookup)
+
+        registry_path = os.path.join(tmp, "merge.sqlite")
+        with CodeRegistry(registry_path) as registry:
+            create_lookup_table(clean.copy(), registry=registry)
+            record("receipts.merge_codes", lambda: merge_codes_by_item_clean(clean.copy(), registry=registry))
+
+        cached_io.CACHE_ENABLED = False
+        statements = record("statements.load_clean", lambda: clean_mock_statements(statements_path))
+        cached_io.CACHE_ENABLED = True
+        record("statements.weighted_averages", lambda: calculate_weighted_averages(statements))
+
+        urls = [f"http://fixtures/{os.path.basename(p)}" for p in sorted(glob.glob(os.path.join(pages_dir, "*.html")))]
+        session = fixture_session(pages_dir)
+        record("pages.fetch_details", lambda: [fetch_product_details(url, session=session) for url in urls])
+
+    return results
+
+
+# ----------------------------------------
+# Baseline comparison
+# ----------------------------------------
+def compare(results, baseline, tolerance=TOLERANCE):
+    """Prints each stage against the baseline; returns the stages that regressed."""
+    regressions = []
+    print(f"\n=== Compared with baseline (tolerance {tolerance:.2f}x) ===")
+    for stage, now in results.items():
+        before = baseline.get(stage)
+        if before is None:
+            print(f"  {stage:<36} new stage")
+            continue
+        ratio = now["seconds"] / before["seconds"] if before["seconds"] else float("inf")
+        slow = ratio > tolerance and now["seconds"] >= MIN_SECONDS
+        line = f"  {stage:<36} {before['seconds']:8.3f}s -> {now['seconds']:8.3f}s ({ratio:.2f}x)"
+        big = False
+        if now.get("peak_mb") and before.get("peak_mb"):
+            mem_ratio = now["peak_mb"] / before["peak_mb"]
+            big = mem_ratio > tolerance
+            line += f", peak {before['peak_mb']:.1f} -> {now['peak_mb']:.1f} MB ({mem_ratio:.2f}x)"
+        if slow or big:
+            regressions.append(stage)
+            line += "  ❌ REGRESSION"
+        print(line)
+    return regressions
+
+
+def _write_json(path, data):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmarks for the NutriTrack pipeline stages.")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help=f"Comma-separated from {', '.join(SIZES)}")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="Baseline JSON to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    parser.add_argument("--no-memory", action="store_true", help="Skip the tracemalloc peak-memory pass")
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    args = parser.parse_args(argv)
+
+    results = {}
+    for label in args.sizes.split(","):
+        label = label.strip().lower()
+        if label not in SIZES:
+            raise SystemExit(f"❌ Unknown size {label!r}; choose from {', '.join(SIZES)}")
+        results.update(run_size(label, SIZES[label], memory=not args.no_memory, data_dir=args.data_dir))
+
+    _write_json(RESULTS_FILE, results)
+    print(f"\n💾 Results saved to {RESULTS_FILE}")
+
+    if args.save_baseline:
+        _write_json(args.baseline, results)
+        print(f"📌 Baseline saved to {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline to record one.")
+        return 0
+    with open(args.baseline) as f:
+        regressions = compare(results, json.load(f), args.tolerance)
+    if regressions:
+        print(f"\n❌ {len(regressions)} stage(s) regressed: {', '.join(regressions)}")
+        return 1
+    print("\n✅ No regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
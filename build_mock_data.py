@@ -1,28 +1,123 @@
 # build_mock_data.py
 
-import pandas as pd
-from utils import select_file
+import os
+import sys
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from utils import select_file, expand_input_paths
 from mock_cleaner import clean_mock_statements, create_mock_lookup, save_cleaned
+from code_registry import open_registry, MOCK_EXPORT_COLUMNS
+from rollup_store import RollupStore, aggregate_mock
+from schema import concat_compact, report_memory
+from instrumentation import pipeline_run, stage, record
 
 # File paths
-MOCK_FILE = select_file()        # User selects input Excel file
-LOOKUP_FILE = "mock_lookup.xlsx" # Stable lookup table
+LOOKUP_DB = "mock_lookup.sqlite" # Stable product-code registry
+LOOKUP_FILE = "mock_lookup.xlsx" # Human-readable export (imported once if no registry yet)
 FINAL_CLEANED_FILE = "mock_cleaned.xlsx"  # Final cleaned file with codes
+ROLLUP_DB = "mock_rollup.sqlite" # Monthly rollup read by mock_summary.py
 
-def main():
-    print("=== STEP 1: Load and clean mock statements ===")
-    df_clean = clean_mock_statements(MOCK_FILE)
-    
-    print(f"✅ Cleaned {len(df_clean)} statements")
+# ----------------------------------------
+# Input selection
+# ----------------------------------------
+def resolve_mock_files(args):
+    """
+    Statement workbooks to ingest: files, directories (their *.xlsx) or glob
+    patterns from the command line, else one file from the GUI picker.
+    This script's own outputs are never picked up as inputs.
+    """
+    if not args:
+        return [select_file(use_argv=False)]
+    outputs = {os.path.abspath(path) for path in (LOOKUP_FILE, FINAL_CLEANED_FILE)}
+    paths = [path for path in expand_input_paths(args) if os.path.abspath(path) not in outputs]
+    if not paths:
+        print("No statement workbooks found. Exiting.")
+        sys.exit()
+    return paths
+
+# ----------------------------------------
+# Cleaning (one worker process per file)
+# ----------------------------------------
+def _clean_file(path, chunksize=None):
+    """Worker: cleans one workbook and times it."""
+    start = time.perf_counter()
+    df = clean_mock_statements(path, chunksize=chunksize)
+    return df, time.perf_counter() - start
+
+
+def clean_mock_files(paths, workers=None, chunksize=None):
+    """
+    Cleans every workbook, in parallel worker processes when there are
+    several, and returns them merged in input order. Prints rows/s per file.
+    With chunksize, each workbook is streamed in chunks of that many rows.
+    """
+    if len(paths) == 1:
+        results = [_clean_file(paths[0], chunksize)]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers or os.cpu_count() or 1, len(paths))) as pool:
+            results = list(pool.map(_clean_file, paths, [chunksize] * len(paths)))
+
+    for path, (df, seconds) in zip(paths, results):
+        size_mb = os.path.getsize(path) / 1e6
+        record("file", path=path, seconds=round(seconds, 4), rows_out=len(df), size_mb=round(size_mb, 2))
+        print(f"⏱️ {os.path.basename(path)}: {len(df)} rows in {seconds:.2f}s "
+              f"({len(df) / max(seconds, 1e-9):,.0f} rows/s, {size_mb / max(seconds, 1e-9):.1f} MB/s)")
+    # Categories differ per file, so merge them on their union
+    return concat_compact((df for df, _ in results), ignore_index=True)
+
+
+def main(paths=None, workers=None, chunksize=None):
+    """
+    Cleans one or many statement workbooks, then updates the lookup and
+    writes the cleaned file and rollup once for all of them.
+    chunksize streams each workbook in chunks of that many rows (for
+    workbooks too large to load at once).
+    Each stage is timed and logged (see instrumentation.py).
+    """
+    if paths is None:
+        paths = resolve_mock_files(sys.argv[1:])
+    with pipeline_run("build_mock_data"):
+        _build(paths, workers, chunksize)
+
+
+def _build(paths, workers, chunksize=None):
+    print(f"=== STEP 1: Load and clean mock statements ({len(paths)} file{'s' if len(paths) != 1 else ''}) ===")
+    with stage("load_clean", rows_in=len(paths)) as st:
+        df_clean = clean_mock_files(paths, workers=workers, chunksize=chunksize)
+        st.rows_out = len(df_clean)
+
+    print(f"✅ Cleaned {len(df_clean)} statements in {st.seconds:.2f}s")
+    report_memory(df_clean, "Cleaned statements")
     print(df_clean.head())
 
     print("\n=== STEP 2: Create/update lookup table and assign codes ===")
-    df_final, lookup_df = create_mock_lookup(df_clean, lookup_path=LOOKUP_FILE)
-    print(f"✅ Lookup table now has {len(lookup_df)} entries")
-    print(lookup_df.head())
+    with open_registry(LOOKUP_DB, legacy_lookup_path=LOOKUP_FILE) as registry:
+        with stage("lookup", rows_in=len(df_clean)) as st:
+            df_final, lookup_df = create_mock_lookup(df_clean, registry=registry)
+            st.rows_out = len(lookup_df)
+        report_memory(df_final, "Coded statements")
+        print(f"✅ Lookup table now has {len(lookup_df)} entries")
+        print(lookup_df.head())
+        with stage("export_lookup", rows_in=len(lookup_df)):
+            registry.export_excel(LOOKUP_FILE, columns=MOCK_EXPORT_COLUMNS)
 
     print("\n=== STEP 3: Save final cleaned statements with codes ===")
-    save_cleaned(df_final, output_path=FINAL_CLEANED_FILE)
+    with stage("save", rows_in=len(df_final)) as st:
+        save_cleaned(df_final, output_path=FINAL_CLEANED_FILE)
+        st.rows_out = len(df_final)
+
+    # The cleaned file is rewritten as a whole, so its rollup is too
+    with RollupStore(ROLLUP_DB) as rollup, stage("rollup", rows_in=len(df_final)) as st:
+        rollup.rebuild(aggregate_mock(df_final))
+        rollup.mark_current(FINAL_CLEANED_FILE)
+        st.rows_out = len(rollup)
+    print(f"📊 Rollup rebuilt: {st.rows_out} item/month/state cells")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Clean statement workbooks and rebuild the mock rollup.")
+    parser.add_argument("paths", nargs="*", help="Files, directories or glob patterns (file picker if none)")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--chunksize", type=int, default=None, help="Stream each workbook in chunks of this many rows")
+    args = parser.parse_args()
+    main(resolve_mock_files(args.paths), args.workers, args.chunksize)
@@ -0,0 +1,69 @@
+# cached_io.py
+
+import os
+import json
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401  (Parquet engine; caching is skipped without it)
+    HAVE_PARQUET = True
+except ImportError:
+    HAVE_PARQUET = False
+
+CACHE_ENABLED = os.environ.get("NUTRITRACK_EXCEL_CACHE", "1") != "0"
+
+
+def _cache_paths(path, sheet_name):
+    folder, base = os.path.split(os.path.abspath(path))
+    stem = os.path.join(folder, f".{base}.{sheet_name}.cache")
+    return stem + ".parquet", stem + ".json"
+
+
+def _cache_key(path, sheet_name, kwargs):
+    stat = os.stat(path)
+    return {
+        "path": os.path.abspath(path),
+        "mtime_ns": stat.st_mtime_ns,
+        "size": stat.st_size,
+        "sheet": str(sheet_name),
+        "options": repr(sorted(kwargs.items())),
+    }
+
+
+def read_excel_cached(path, sheet_name=0, **kwargs):
+    """
+    Drop-in for pd.read_excel(path, sheet_name=..., **kwargs) that keeps a
+    Parquet copy next to the workbook (.<name>.<sheet>.cache.parquet).
+    The copy is reused while the workbook's path, mtime, size, sheet and read
+    options are unchanged, and rebuilt otherwise. Falls back to a plain
+    read_excel without pyarrow, when disabled via NUTRITRACK_EXCEL_CACHE=0,
+    or when a frame can't be stored as Parquet (e.g. mixed-type columns).
+    """
+    if not (CACHE_ENABLED and HAVE_PARQUET) or sheet_name is None:
+        return pd.read_excel(path, sheet_name=sheet_name, **kwargs)
+
+    key = _cache_key(path, sheet_name, kwargs)  # Raises FileNotFoundError like read_excel
+    data_path, meta_path = _cache_paths(path, sheet_name)
+
+    try:
+        with open(meta_path) as f:
+            if json.load(f) == key:
+                return pd.read_parquet(data_path)
+    except (OSError, ValueError):
+        pass  # No cache yet, or unreadable: rebuild below
+
+    df = pd.read_excel(path, sheet_name=sheet_name, **kwargs)
+    try:
+        if os.path.exists(meta_path):
+            os.remove(meta_path)  # Never leave old metadata pointing at new data
+        df.to_parquet(data_path + ".tmp", index=True)
+        os.replace(data_path + ".tmp", data_path)
+        with open(meta_path + ".tmp", "w") as f:
+            json.dump(key, f)
+        os.replace(meta_path + ".tmp", meta_path)
+    except Exception as e:
+        print(f"⚠️ Not caching {path} [{sheet_name}]: {e}")
+        for tmp in (data_path + ".tmp", meta_path + ".tmp"):
+            if os.path.exists(tmp):
+                os.remove(tmp)
+    return df
@@ -0,0 +1,202 @@
+# code_registry.py
+
+import os
+import sqlite3
+import pandas as pd
+from excel_output import write_excel
+
+LOOKUP_COLUMNS = ["store", "item_clean", "productCode"]
+MOCK_STORE = ""  # Mock statement items have no store
+MOCK_EXPORT_COLUMNS = {"item_clean": "name_clean", "productCode": "productCode"}
+
+
+class CodeRegistry:
+    """
+    Product-code registry in an indexed SQLite file.
+    - codes: one productCode per (store, item_clean)
+    - preferred_codes: one productCode per normalized item_clean (the most
+      common code across stores, lowest on ties), kept up to date on upsert
+    Open it once per run and pass the handle to the cleaners and merge step.
+    """
+
+    def __init__(self, path="item_lookup.sqlite"):
+        self.path = path
+        self.con = sqlite3.connect(path)
+        self.con.executescript("""
+            CREATE TABLE IF NOT EXISTS codes (
+                store TEXT NOT NULL,
+                item_clean TEXT NOT NULL,
+                item_key TEXT NOT NULL,
+                productCode INTEGER NOT NULL
+            );
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_codes_store_item ON codes (store, item_clean);
+            CREATE INDEX IF NOT EXISTS idx_codes_item_key ON codes (item_key);
+            CREATE TABLE IF NOT EXISTS preferred_codes (
+                item_key TEXT PRIMARY KEY,
+                productCode INTEGER NOT NULL
+            );
+        """)
+        self._frame = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.con.close()
+
+    def __len__(self):
+        return self.con.execute("SELECT COUNT(*) FROM codes").fetchone()[0]
+
+    # ----------------------------------------
+    # Lookups
+    # ----------------------------------------
+    def get(self, store, item_clean):
+        """Returns the productCode for a store/item_clean, or None."""
+        row = self.con.execute(
+            "SELECT productCode FROM codes WHERE store = ? AND item_clean = ?", (store, item_clean)
+        ).fetchone()
+        return row[0] if row else None
+
+    def preferred(self, item_clean):
+        """Returns the preferred productCode for an item across stores, or None."""
+        row = self.con.execute(
+            "SELECT productCode FROM preferred_codes WHERE item_key = ?", (str(item_clean).strip().lower(),)
+        ).fetchone()
+        return row[0] if row else None
+
+    def lookup_frame(self):
+        """All codes as a store/item_clean/productCode DataFrame, sorted like the Excel lookup."""
+        if self._frame is None:
+            self._frame = pd.read_sql_query(
+                "SELECT store, item_clean, productCode FROM codes ORDER BY store, item_clean", self.con
+            ).astype({"productCode": "Int64"})
+        return self._frame
+
+    def preferred_codes(self):
+        """Series mapping normalized item_clean -> preferred productCode."""
+        prefs = pd.read_sql_query("SELECT item_key, productCode FROM preferred_codes", self.con)
+        return prefs.set_index("item_key")["productCode"].astype("Int64").rename_axis("item_clean")
+
+    # ----------------------------------------
+    # Updates
+    # ----------------------------------------
+    def upsert_many(self, records):
+        """
+        Adds store/item_clean/productCode rows for pairs not yet in the
+        registry, in one transaction, and refreshes the preferred code of
+        every item touched. Codes already assigned are never changed, so they
+        stay stable across incremental runs (use reassign_codes to change
+        them on purpose). A pair listed with several codes in one batch gets
+        the most common of them, lowest on ties.
+        """
+        rows = self._rows(records, resolve_duplicates=True)
+        if not rows:
+            return
+        with self.con:
+            self.con.executemany(
+                "INSERT INTO codes (store, item_clean, item_key, productCode) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (store, item_clean) DO NOTHING",
+                rows,
+            )
+            self._refresh_preferred(rows)
+        self._frame = None
+
+    def reassign_codes(self, records):
+        """
+        Sets the productCode of each store/item_clean row, overwriting any
+        existing code (e.g. merging duplicates with item_dedupe.py). Pairs
+        must be unique within records.
+        """
+        rows = self._rows(records)
+        if not rows:
+            return
+        with self.con:
+            self.con.executemany(
+                "INSERT INTO codes (store, item_clean, item_key, productCode) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (store, item_clean) DO UPDATE SET productCode = excluded.productCode",
+                rows,
+            )
+            self._refresh_preferred(rows)
+        self._frame = None
+
+    @staticmethod
+    def _rows(records, resolve_duplicates=False):
+        """(store, item_clean, item_key, productCode) tuples for the non-null LOOKUP_COLUMNS rows."""
+        records = records[LOOKUP_COLUMNS].dropna()
+        if records.empty:
+            return []
+        records = records.assign(
+            store=records["store"].astype(str),
+            item_clean=records["item_clean"].astype(str),
+            productCode=records["productCode"].astype("int64"),
+        )
+        if resolve_duplicates:
+            counts = records.groupby(LOOKUP_COLUMNS, observed=True).size().rename("rows").reset_index()
+            records = (
+                counts.sort_values(["store", "item_clean", "rows", "productCode"],
+                                   ascending=[True, True, False, True], kind="stable")
+                      .drop_duplicates(["store", "item_clean"])
+            )
+        return [
+            (store, item, item.strip().lower(), int(code))
+            for store, item, code in zip(records["store"], records["item_clean"], records["productCode"])
+        ]
+
+    def _refresh_preferred(self, rows):
+        """Recomputes preferred_codes for the item keys in rows (inside the caller's transaction)."""
+        self.con.execute("CREATE TEMP TABLE IF NOT EXISTS touched (item_key TEXT PRIMARY KEY)")
+        self.con.execute("DELETE FROM temp.touched")
+        self.con.executemany(
+            "INSERT OR IGNORE INTO temp.touched VALUES (?)", ((key,) for _, _, key, _ in rows)
+        )
+        self.con.execute("""
+            INSERT OR REPLACE INTO preferred_codes (item_key, productCode)
+            SELECT item_key, productCode FROM (
+                SELECT item_key, productCode,
+                       ROW_NUMBER() OVER (
+                           PARTITION BY item_key ORDER BY COUNT(*) DESC, productCode
+                       ) AS pos
+                FROM codes
+                WHERE item_key IN (SELECT item_key FROM temp.touched)
+                GROUP BY item_key, productCode
+            )
+            WHERE pos = 1
+        """)
+
+    def import_excel(self, lookup_path):
+        """
+        Loads an existing Excel lookup; first code per pair wins. Mock lookups
+        (name_clean/productCode) are imported with an empty store.
+        """
+        lookup_df = pd.read_excel(lookup_path, dtype={"productCode": "Int64"})
+        lookup_df = lookup_df.rename(columns={"name_clean": "item_clean"})
+        if "store" not in lookup_df.columns:
+            lookup_df["store"] = MOCK_STORE
+        lookup_df = lookup_df.dropna(subset=LOOKUP_COLUMNS).drop_duplicates(subset=["store", "item_clean"])
+        self.upsert_many(lookup_df)
+        print(f"📥 Imported {len(lookup_df)} codes from {lookup_path} into {self.path}")
+
+    # ----------------------------------------
+    # Export for humans
+    # ----------------------------------------
+    def export_excel(self, lookup_path, columns=None):
+        """
+        Writes the registry to an Excel lookup sheet. columns renames/selects
+        the output columns, e.g. {"item_clean": "name_clean", "productCode": "productCode"}.
+        """
+        lookup_df = self.lookup_frame()
+        if columns:
+            lookup_df = lookup_df[list(columns)].rename(columns=columns)
+        write_excel(lookup_df, lookup_path, sheet_name="Lookup")
+        print(f"✅ Lookup exported to {lookup_path}")
+
+
+def open_registry(path="item_lookup.sqlite", legacy_lookup_path=None):
+    """Opens the registry, importing a legacy Excel lookup the first time."""
+    registry = CodeRegistry(path)
+    if len(registry) == 0 and legacy_lookup_path and os.path.exists(legacy_lookup_path):
+        registry.import_excel(legacy_lookup_path)
+    return registry
@@ -0,0 +1,2 @@
+# conftest.py
+# Lets tests/ import the top-level pipeline modules.
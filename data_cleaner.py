@@ -1,21 +1,22 @@
 import pandas as pd
 import os
-from openpyxl.utils import get_column_letter
+from product_codes import assign_codes, receipt_key
+from cached_io import read_excel_cached
+from excel_stream import CHUNK_ROWS, iter_excel_chunks
+from excel_output import write_excel
+from schema import compact_frame, concat_compact
 
-AUTO_CODE_START = 90000000  # Base for autogenerated codes
+RECEIPT_COLUMNS = ["store", "location", "item", "price", "quantity", "date"]
+CLEANED_COLUMNS = ["store", "location", "date", "price", "quantity", "productCode", "item_clean", "total_value"]
+FINGERPRINT_COL = "row_fingerprint"
 
-def clean_receipts(file_path):
-    """
-    Load and clean receipts data from Excel.
-    Ensures required columns exist and normalizes data.
-    Removes unnecessary columns and keeps original order.
-    """
-    df = pd.read_excel(file_path)
+
+def _prepare_raw_receipts(df, seen=None):
+    """Checks columns and adds row fingerprints to raw receipt rows."""
     df.columns = df.columns.str.strip()  # Clean headers
 
     # Required columns
-    required = ["store", "location", "item", "price", "quantity", "date"]
-    for col in required:
+    for col in RECEIPT_COLUMNS:
         if col not in df.columns:
             raise KeyError(f"Missing required column: {col}")
 
@@ -23,6 +24,58 @@ def clean_receipts(file_path):
     if "productCode" not in df.columns:
         df["productCode"] = None
 
+    df[FINGERPRINT_COL] = receipt_fingerprints(df, seen)
+    return df
+
+
+def load_receipts(file_path):
+    """
+    Load raw receipts from Excel and check the required columns.
+    Adds a row_fingerprint per raw row (content hash plus occurrence number,
+    so identical lines stay distinct) for incremental runs.
+    """
+    return _prepare_raw_receipts(read_excel_cached(file_path))
+
+
+def iter_load_receipts(file_path, chunksize=CHUNK_ROWS):
+    """Like load_receipts, but streams the sheet in chunks of raw rows."""
+    seen = {}
+    for chunk in iter_excel_chunks(file_path, chunksize=chunksize):
+        yield _prepare_raw_receipts(chunk, seen)
+
+
+def _canonical_text(col):
+    """Text form of raw cell values that doesn't depend on the column's inferred dtype (2 == 2.0)."""
+    values = col.astype(object)
+    text = values.where(col.notna(), "").map(str)
+    if not pd.api.types.is_datetime64_any_dtype(col):
+        num = pd.to_numeric(values, errors="coerce")
+        integral = num.notna() & (num % 1 == 0)
+        text[integral] = num[integral].map("{:.0f}".format)
+    return text
+
+
+def receipt_fingerprints(df, seen=None):
+    """
+    Stable per-row fingerprints of the raw receipt columns (same across runs,
+    processes and chunking). Pass the same `seen` dict to every chunk of a
+    file so repeated identical rows keep counting up across chunks.
+    """
+    content = pd.DataFrame({col: _canonical_text(df[col]) for col in RECEIPT_COLUMNS + ["productCode"]})
+    hashes = pd.Series(pd.util.hash_pandas_object(content, index=False).to_numpy(), index=df.index)
+    occurrence = hashes.groupby(hashes).cumcount()
+    if seen is not None:
+        occurrence += hashes.map(seen).fillna(0).astype("int64")
+        for key, count in hashes.value_counts().items():
+            seen[key] = seen.get(key, 0) + count
+    return hashes.map("{:016x}".format).astype(str) + ":" + occurrence.astype(str)
+
+
+def clean_receipts_frame(df):
+    """
+    Clean raw receipt rows (as returned by load_receipts).
+    Normalizes data, removes unnecessary columns and keeps original order.
+    """
     # Convert column types
     df["date"] = pd.to_datetime(df["date"], dayfirst=True, errors="coerce")
     df["price"] = pd.to_numeric(df["price"], errors="coerce")
@@ -38,23 +91,66 @@ def clean_receipts(file_path):
     df["total_value"] = df["price"] * df["quantity"]
 
     # Keep only necessary columns, preserving original order
-    keep_cols = ["store", "location", "date", "price", "quantity", "productCode", "item_clean", "total_value"]
+    keep_cols = list(CLEANED_COLUMNS)
+    if FINGERPRINT_COL in df.columns:
+        keep_cols.append(FINGERPRINT_COL)
     df = df[keep_cols]
 
     return df
 
 
+def iter_clean_receipts(file_path, chunksize=CHUNK_ROWS):
+    """Streams cleaned receipts chunk by chunk; memory stays flat in the workbook size."""
+    for raw in iter_load_receipts(file_path, chunksize=chunksize):
+        yield clean_receipts_frame(raw)
+
+
+def clean_receipts(file_path, chunksize=None):
+    """
+    Load and clean receipts data from Excel.
+    Ensures required columns exist and normalizes data.
+    Removes unnecessary columns and keeps original order.
+    With chunksize, the sheet is streamed and cleaned in chunks (same result);
+    only the compacted cleaned chunks are kept in memory.
+    Returns compact dtypes (see schema.py).
+    """
+    if chunksize:
+        return concat_compact(iter_clean_receipts(file_path, chunksize=chunksize),
+                              columns=CLEANED_COLUMNS + [FINGERPRINT_COL])
+    return compact_frame(clean_receipts_frame(load_receipts(file_path)))
+
+
+def split_changed_receipts(raw_df, cleaned_df, processed=None):
+    """
+    Compare raw receipts against a previously cleaned output by fingerprint.
+    processed holds the fingerprints of every raw row the previous run
+    handled, including rows cleaning dropped, so those aren't cleaned again;
+    without it only the cleaned rows count as handled.
+    Returns (new_raw, kept, removed):
+    - new_raw: raw rows not processed yet (new or edited)
+    - kept: cleaned rows whose raw row is unchanged
+    - removed: cleaned rows whose raw row was edited or deleted
+    """
+    if FINGERPRINT_COL not in cleaned_df.columns:
+        return raw_df, cleaned_df.iloc[0:0], cleaned_df
+    if processed is None:
+        processed = cleaned_df[FINGERPRINT_COL]
+    seen = cleaned_df[FINGERPRINT_COL].isin(raw_df[FINGERPRINT_COL])
+    new_raw = raw_df[~raw_df[FINGERPRINT_COL].isin(processed)].copy()
+    return new_raw, cleaned_df[seen], cleaned_df[~seen]
+
 
-def create_lookup_table(df, lookup_path="item_lookup.xlsx"):
+def create_lookup_table(df, lookup_path="item_lookup.xlsx", registry=None):
     """
     Build/update a stable lookup table for items.
     Ensures all store/item_clean combos have a stable productCode.
+    If a CodeRegistry is given, codes are read from and upserted into it
+    instead of the Excel file at lookup_path.
     """
-    import os
-    from openpyxl.utils import get_column_letter
-
-    if os.path.exists(lookup_path):
-        lookup_df = pd.read_excel(lookup_path, dtype={"productCode": "Int64"})
+    if registry is not None:
+        lookup_df = registry.lookup_frame()
+    elif os.path.exists(lookup_path):
+        lookup_df = read_excel_cached(lookup_path, dtype={"productCode": "Int64"})
     else:
         lookup_df = pd.DataFrame(columns=["store", "item_clean", "productCode"])
 
@@ -69,33 +165,43 @@ def create_lookup_table(df, lookup_path="item_lookup.xlsx"):
     df["productCode"] = df["productCode"].fillna(df["productCode_lookup"])
     df = df.drop(columns=[c for c in df.columns if c.endswith("_lookup")])
 
-    updated_records = []
-
-    for _, row in df.iterrows():
-        store = str(row["store"]).strip()
-        item_clean = str(row["item_clean"]).strip()
-
-        # Assign existing or new code
-        if pd.notna(row["productCode"]):
-            code = int(row["productCode"])
-        else:
-            code = AUTO_CODE_START + (abs(hash(store + item_clean)) % 10000000)
-
-        # Check if this store/item_clean already exists in lookup
-        match = lookup_df[(lookup_df["store"] == store) & (lookup_df["item_clean"] == item_clean)]
-        if match.empty or code not in match["productCode"].values:
-            updated_records.append({
-                "store": store,
-                "item_clean": item_clean,
-                "productCode": code
-            })
-
-        # Update df with code
-        df.loc[row.name, "productCode"] = code
+    # Normalized keys, one entry per unique store/item_clean
+    store_key = df["store"].map(str).str.strip()
+    item_key = df["item_clean"].map(str).str.strip()
+    keys = pd.DataFrame({"store": store_key, "item_clean": item_key})
+
+    # Generate stable codes once per unique key that has no code yet,
+    # avoiding codes already owned by other items
+    codes = pd.to_numeric(df["productCode"], errors="coerce").astype("Int64")
+    missing = codes.isna()
+    if missing.any():
+        owned = pd.concat([
+            lookup_df[["store", "item_clean", "productCode"]].dropna(subset=["productCode"]),
+            keys[~missing].assign(productCode=codes[~missing]),
+        ])
+        taken = {
+            int(code): receipt_key(store, item)
+            for store, item, code in zip(owned["store"], owned["item_clean"], owned["productCode"])
+        }
+        new_keys = keys[missing].drop_duplicates()
+        new_keys["key"] = [receipt_key(s, i) for s, i in zip(new_keys["store"], new_keys["item_clean"])]
+        assigned = assign_codes(new_keys["key"], taken)
+        new_keys["productCode"] = new_keys["key"].map(assigned).astype("Int64")
+        codes[missing] = keys[missing].merge(new_keys, how="left")["productCode"].to_numpy()
+
+    # New lookup entries: store/item_clean/code combos not already in the lookup
+    candidates = keys.assign(productCode=codes.to_numpy()).drop_duplicates()
+    existing = lookup_df[["store", "item_clean", "productCode"]].astype({"productCode": "Int64"})
+    candidates = candidates.merge(existing.drop_duplicates(), how="left", indicator=True)
+    updated_records = candidates.loc[candidates["_merge"] == "left_only", ["store", "item_clean", "productCode"]]
+
+    if registry is not None:
+        registry.upsert_many(updated_records)
+        return registry.lookup_frame()
 
     # Merge new records
-    if updated_records:
-        lookup_df = pd.concat([lookup_df, pd.DataFrame(updated_records)], ignore_index=True)
+    if not updated_records.empty:
+        lookup_df = pd.concat([lookup_df, updated_records], ignore_index=True)
 
     # Deduplicate by store+item_clean+productCode
     lookup_df = lookup_df.drop_duplicates(subset=["store", "item_clean", "productCode"])
@@ -104,30 +210,15 @@ def create_lookup_table(df, lookup_path="item_lookup.xlsx"):
     lookup_df = lookup_df.sort_values(["store", "item_clean"]).reset_index(drop=True)
 
     # Save nicely
-    with pd.ExcelWriter(lookup_path, engine="openpyxl") as writer:
-        lookup_df.to_excel(writer, index=False, sheet_name="Lookup")
-        worksheet = writer.sheets["Lookup"]
-        for i, col in enumerate(lookup_df.columns, 1):
-            max_len = max(lookup_df[col].astype(str).map(len).max(), len(col)) + 2
-            worksheet.column_dimensions[get_column_letter(i)].width = max_len
+    write_excel(lookup_df, lookup_path, sheet_name="Lookup")
 
     return lookup_df
 
 
-def merge_codes_by_item_clean(df: pd.DataFrame, lookup_path: str = "item_lookup.xlsx") -> pd.DataFrame:
-    """
-    Fill missing df['productCode'] by matching df['item_clean'] to the lookup table.
-    - No merge (so rows never reorder)
-    - Only fills where productCode is NA
-    - If multiple codes exist for the same item_clean in the lookup, uses the mode (most frequent),
-      falling back to the first seen.
-    """
-    if not os.path.exists(lookup_path):
-        # Nothing to fill from
-        return df
-
+def _preferred_codes_from_excel(lookup_path):
+    """Maps normalized item_clean -> preferred code from an Excel lookup."""
     # Read lookup and normalize types
-    lookup = pd.read_excel(lookup_path, dtype={"productCode": "Int64"}).copy()
+    lookup = read_excel_cached(lookup_path, dtype={"productCode": "Int64"}).copy()
 
     # Ensure normalized key exists in lookup
     lookup["item_clean"] = (
@@ -140,12 +231,30 @@ def merge_codes_by_item_clean(df: pd.DataFrame, lookup_path: str = "item_lookup.
         m = series.mode(dropna=True)
         return m.iat[0] if not m.empty else series.dropna().iloc[0]
 
-    code_map = (
+    return (
         lookup.dropna(subset=["productCode"])
               .groupby("item_clean")["productCode"]
               .agg(_prefer_code)
     )
 
+
+def merge_codes_by_item_clean(df: pd.DataFrame, lookup_path: str = "item_lookup.xlsx", registry=None) -> pd.DataFrame:
+    """
+    Fill missing df['productCode'] by matching df['item_clean'] to the lookup table.
+    - No merge (so rows never reorder)
+    - Only fills where productCode is NA
+    - If multiple codes exist for the same item_clean in the lookup, uses the mode (most frequent),
+      falling back to the first seen.
+    - With a CodeRegistry, uses its precomputed preferred codes instead of re-reading lookup_path.
+    """
+    if registry is not None:
+        code_map = registry.preferred_codes()
+    elif not os.path.exists(lookup_path):
+        # Nothing to fill from
+        return df
+    else:
+        code_map = _preferred_codes_from_excel(lookup_path)
+
     # Ensure df has correct dtype and key normalized
     if "productCode" not in df.columns:
         df["productCode"] = pd.Series([pd.NA] * len(df), dtype="Int64")
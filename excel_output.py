@@ -0,0 +1,114 @@
+# excel_output.py
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font
+from openpyxl.utils import get_column_letter
+
+try:
+    import xlsxwriter  # Faster constant-memory writer; openpyxl write-only mode otherwise
+    HAVE_XLSXWRITER = True
+except ImportError:
+    HAVE_XLSXWRITER = False
+
+WRITE_CHUNK_ROWS = 10000  # Rows converted to Python values at a time
+WIDTH_SAMPLE_ROWS = 1000  # Rows sampled per text column to estimate its width
+MAX_COLUMN_WIDTH = 60
+DATETIME_WIDTH = 19       # "YYYY-MM-DD HH:MM:SS"
+
+
+def estimate_column_width(series, sample_rows=WIDTH_SAMPLE_ROWS):
+    """
+    Column width from the dtype plus a bounded, evenly spaced sample of values
+    (never a full scan), padded like the old auto-fit (+2).
+    """
+    header = len(str(series.name))
+    values = series.dropna()
+    if values.empty:
+        return header + 2
+    if pd.api.types.is_datetime64_any_dtype(values):
+        width = DATETIME_WIDTH
+    elif pd.api.types.is_bool_dtype(values):
+        width = 5
+    elif pd.api.types.is_numeric_dtype(values):
+        # The widest number is at one of the extremes (or has many decimals)
+        extremes = pd.Series([values.min(), values.max()]).astype(str).str.len().max()
+        sample = _sample(values, sample_rows).astype(str).str.len().max()
+        width = max(extremes, sample)
+    else:
+        width = _sample(values, sample_rows).astype(str).str.len().max()
+    return min(max(width, header) + 2, MAX_COLUMN_WIDTH)
+
+
+def _sample(values, sample_rows):
+    if len(values) <= sample_rows:
+        return values
+    positions = np.linspace(0, len(values) - 1, sample_rows).astype(int)
+    return values.iloc[positions]
+
+
+def _python_rows(df):
+    """Yields rows as tuples of openpyxl-friendly values, converting one chunk at a time."""
+    for start in range(0, len(df), WRITE_CHUNK_ROWS):
+        block = df.iloc[start:start + WRITE_CHUNK_ROWS]
+        for col in block.columns:
+            if isinstance(block[col].dtype, pd.PeriodDtype):
+                block = block.assign(**{col: block[col].astype(str)})
+        values = block.astype(object).where(block.notna(), None)
+        yield from values.itertuples(index=False, name=None)
+
+
+def _write_xlsxwriter(df, output_path, sheet_name, widths):
+    wb = xlsxwriter.Workbook(output_path, {"constant_memory": True})
+    ws = wb.add_worksheet(sheet_name)
+    date_format = wb.add_format({"num_format": "yyyy-mm-dd hh:mm:ss"})
+    date_cols = [i for i, col in enumerate(df.columns) if pd.api.types.is_datetime64_any_dtype(df[col])]
+
+    # Column formats apply to every unformatted cell, so dates need no per-cell format
+    for i in range(len(df.columns)):
+        if widths or i in date_cols:
+            ws.set_column(i, i, widths[i] if widths else None, date_format if i in date_cols else None)
+    header_format = wb.add_format({"bold": True}) if widths else None
+    ws.write_row(0, 0, [str(col) for col in df.columns], header_format)
+
+    for r, row in enumerate(_python_rows(df), 1):
+        ws.write_row(r, 0, row)
+    wb.close()
+
+
+def _write_openpyxl(df, output_path, sheet_name, widths):
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title=sheet_name)
+
+    if widths:
+        for i, width in enumerate(widths, 1):
+            ws.column_dimensions[get_column_letter(i)].width = width
+        header = []
+        for col in df.columns:
+            cell = WriteOnlyCell(ws, value=str(col))
+            cell.font = Font(bold=True)
+            header.append(cell)
+        ws.append(header)
+    else:
+        ws.append([str(col) for col in df.columns])
+
+    for row in _python_rows(df):
+        ws.append(row)
+    wb.save(output_path)
+
+
+def write_excel(df, output_path, sheet_name="Sheet1", formatting=True, sample_rows=WIDTH_SAMPLE_ROWS):
+    """
+    Writes df (without its index) to a single-sheet workbook, streaming rows
+    with a constant-memory writer (xlsxwriter if installed, otherwise
+    openpyxl's write-only mode).
+    formatting=False skips header styling and column widths (use it for files
+    only read back by code).
+    """
+    widths = [estimate_column_width(df[col], sample_rows) for col in df.columns] if formatting else None
+    if HAVE_XLSXWRITER:
+        _write_xlsxwriter(df, output_path, sheet_name, widths)
+    else:
+        _write_openpyxl(df, output_path, sheet_name, widths)
@@ -0,0 +1,52 @@
+# excel_stream.py
+
+import pandas as pd
+from openpyxl import load_workbook
+
+CHUNK_ROWS = 50000  # Rows per chunk when streaming large sheets
+# Text cells read_excel treats as missing by default
+NA_STRINGS = {"", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+              "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null"}
+
+
+def _to_frame(rows, columns, start):
+    df = pd.DataFrame(rows, columns=columns, index=range(start, start + len(rows)), dtype=None if rows else object)
+    # Empty cells come back as None; read_excel gives all-empty columns as float NaN
+    empty = [col for col in df.columns if rows and df[col].dtype == object and df[col].isna().all()]
+    if empty:
+        df[empty] = df[empty].astype("float64")
+    return df
+
+
+def iter_excel_chunks(path, sheet_name=0, chunksize=CHUNK_ROWS):
+    """
+    Yields a sheet as DataFrames of up to `chunksize` rows, using openpyxl's
+    read-only mode so only one chunk is held in memory at a time.
+    The first row is the header (blank headers become "Unnamed: <i>", as in
+    read_excel); completely empty rows are skipped. Row labels continue
+    across chunks, matching a single read_excel of the sheet. A sheet with
+    a header but no rows yields one empty frame with the header's columns.
+    """
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        ws = wb.worksheets[sheet_name] if isinstance(sheet_name, int) else wb[sheet_name]
+        rows = ws.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = [str(h) if h is not None else f"Unnamed: {i}" for i, h in enumerate(header)]
+
+        chunk, start, yielded = [], 0, False
+        for row in rows:
+            if all(v is None for v in row):
+                continue
+            row = tuple(None if isinstance(v, str) and v in NA_STRINGS else v for v in row[:len(columns)])
+            chunk.append(row + (None,) * (len(columns) - len(row)))
+            if len(chunk) >= chunksize:
+                yield _to_frame(chunk, columns, start)
+                start += len(chunk)
+                chunk, yielded = [], True
+        if chunk or not yielded:
+            yield _to_frame(chunk, columns, start)
+    finally:
+        wb.close()
@@ -0,0 +1,400 @@
+# history_store.py
+
+import os
+import sys
+import glob
+import sqlite3
+import uuid
+import numpy as np
+import pandas as pd
+from excel_output import write_excel
+from cached_io import read_excel_cached
+from pack_units import MULTIPACK_PATTERN, NORMALISED_COLUMNS, QUANTITY_PATTERN, normalise_history
+
+HISTORY_COLUMNS = ["url", "name", "pack_weight", "overall_price", "price_per_unit", "unit", "scraped_at"]
+CHANGE_COLUMNS = ["overall_price", "price_per_unit", "pack_weight"]  # A new change-only row when any differs
+COMPACT_COLUMNS = HISTORY_COLUMNS + ["last_seen_at", "seen_count"]
+
+
+# ----------------------------------------
+# Helpers shared by all backends
+# ----------------------------------------
+def _conform(df):
+    """Returns df with exactly HISTORY_COLUMNS, in order (missing ones as NA)."""
+    return df.reindex(columns=HISTORY_COLUMNS)
+
+
+def build_last_scraped_index(history, key="url"):
+    """
+    Returns {key value: last scraped_at} built in one pass over the history.
+    Rows without a value for `key` (e.g. history saved before URLs were
+    recorded) are ignored.
+    """
+    if key not in history.columns or history.empty:
+        return {}
+    last = (
+        history.dropna(subset=[key])
+               .assign(scraped_at=lambda h: pd.to_datetime(h["scraped_at"], errors="coerce"))
+               .groupby(key)["scraped_at"]
+               .max()
+               .dropna()
+    )
+    return last.to_dict()
+
+
+def _product_key(history):
+    """Products are identified by URL, or by name for rows saved before URLs were recorded."""
+    return history["url"].where(history["url"].notna(), history["name"])
+
+
+def complete_multipacks(history):
+    """
+    Older scrapes cut multipack sizes short, storing "6 X" for "6 X 330ML".
+    Fills each bare multiplier from the same product's nearest later (else
+    earlier) full pack_weight with that count, so the cut doesn't read as a
+    pack change. Bare values with no such pack are left as they are.
+    """
+    if history.empty or not {"pack_weight", "scraped_at"} <= set(history.columns):
+        return history
+    # Parse each distinct pack string once, as parse_quantities does
+    codes, uniques = pd.factorize(history["pack_weight"].astype("string"))
+    upper = pd.Series(uniques, dtype="string").str.upper()
+    bare = pd.to_numeric(upper.str.extract(MULTIPACK_PATTERN)[0], errors="coerce").to_numpy()
+    if np.isnan(bare).all():
+        return history
+    count = pd.to_numeric(upper.str.extract(QUANTITY_PATTERN)["count"], errors="coerce").to_numpy()
+    bare, count = np.append(bare, np.nan)[codes], np.append(count, np.nan)[codes]
+
+    packs = pd.DataFrame({
+        "key": _product_key(history),
+        "count": np.where(np.isnan(bare), count, bare),
+        "full": history["pack_weight"].where(~np.isnan(count)),
+        "scraped_at": pd.to_datetime(history["scraped_at"], errors="coerce"),
+    }, index=history.index).sort_values("scraped_at", kind="stable")
+    by_pack = packs.groupby(["key", "count"], sort=False)["full"]
+    filled = by_pack.bfill().fillna(by_pack.ffill()).reindex(history.index)
+
+    completed = ~np.isnan(bare) & filled.notna().to_numpy()
+    if not completed.any():
+        return history
+    history = history.copy()
+    history.loc[completed, "pack_weight"] = filled[completed]
+    return history
+
+
+# ----------------------------------------
+# Change-only (delta) form
+# ----------------------------------------
+def compress_history(history):
+    """
+    Vectorized diff of a history into change-only form: per product, sorted
+    by scraped_at, only rows whose CHANGE_COLUMNS differ from the previous
+    row are kept. Each kept row gets last_seen_at (last visit before the
+    next change) and seen_count (visits it stands for). Extra columns
+    ride along, and already-compact input compresses again correctly.
+    """
+    h = history.reindex(columns=list(dict.fromkeys(HISTORY_COLUMNS + list(history.columns))))
+    scraped = pd.to_datetime(h["scraped_at"], errors="coerce")
+    last_seen = pd.to_datetime(h["last_seen_at"], errors="coerce") if "last_seen_at" in history else scraped
+    h = h.assign(
+        scraped_at=scraped,
+        last_seen_at=last_seen.fillna(scraped),
+        seen_count=pd.to_numeric(h["seen_count"], errors="coerce").fillna(1) if "seen_count" in history else 1,
+        _key=_product_key(h),
+    ).sort_values(["_key", "scraped_at"], kind="stable")
+    h = complete_multipacks(h)
+
+    changed = h["_key"].ne(h["_key"].shift()) | h["_key"].isna()
+    for col in CHANGE_COLUMNS:
+        current, previous = h[col], h[col].shift()
+        same = (current == previous).fillna(False).astype(bool) | (current.isna() & previous.isna())
+        changed |= ~same
+
+    run = changed.cumsum()
+    runs = h.groupby(run, sort=False)
+    compact = h.loc[changed].copy()
+    compact["last_seen_at"] = runs["last_seen_at"].max().to_numpy()
+    compact["seen_count"] = runs["seen_count"].sum().astype(int).to_numpy()
+    return compact.drop(columns="_key").reset_index(drop=True)
+
+
+def expand_history(compact, freq="D"):
+    """
+    Expands change-only history back to a dense series: one row per product
+    per period (a fixed frequency: "D", "12h", ...) from its first visit to its last, each
+    carrying the values in effect then. scraped_at becomes the period
+    start. Within a period the latest change wins.
+    """
+    step = pd.Timedelta(freq if freq[:1].isdigit() else f"1{freq}")
+    c = compact.assign(
+        scraped_at=pd.to_datetime(compact["scraped_at"], errors="coerce"),
+        last_seen_at=pd.to_datetime(compact.get("last_seen_at", compact["scraped_at"]), errors="coerce"),
+        _key=_product_key(compact),
+    ).dropna(subset=["scraped_at", "_key"]).sort_values(["_key", "scraped_at"], kind="stable")
+
+    # Values hold until the period before the product's next change, or its last visit
+    start = c["scraped_at"].dt.floor(freq)
+    next_start = start.groupby(c["_key"]).shift(-1)
+    end = (next_start - step).where(next_start.notna(), c["last_seen_at"].fillna(c["scraped_at"]).dt.floor(freq))
+    counts = ((end - start) // step + 1).clip(lower=0).astype(int).to_numpy()
+
+    rows = np.repeat(np.arange(len(c)), counts)
+    offsets = np.arange(len(rows)) - np.repeat(np.cumsum(counts) - counts, counts)
+    dense = c.iloc[rows].reindex(columns=HISTORY_COLUMNS)
+    dense["scraped_at"] = start.to_numpy()[rows] + offsets * step
+    return dense.reset_index(drop=True)
+
+
+def export_excel(df, output_path, normalise=True):
+    """
+    Writes the history to an Excel workbook with estimated column widths,
+    plus normalised pack_quantity/pack_unit/price_per_base_unit columns
+    (normalise=False writes the history as is, for stores that persist to Excel).
+    """
+    write_excel(normalise_history(df) if normalise else df, output_path, sheet_name="History")
+
+    print(f"✅ Exported {len(df)} history rows to {output_path}")
+
+
+# ----------------------------------------
+# Backends
+# ----------------------------------------
+class ExcelHistoryStore:
+    """Legacy store: the whole history in one workbook, rewritten on every append."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return pd.DataFrame(columns=HISTORY_COLUMNS)
+        # Derived columns are recomputed on export; drop any an older version stored
+        return complete_multipacks(read_excel_cached(self.path).drop(columns=NORMALISED_COLUMNS, errors="ignore"))
+
+    def append(self, df):
+        updated = pd.concat([self.load(), df], ignore_index=True)
+        export_excel(updated, self.path, normalise=False)
+
+    def last_scraped(self, key="url"):
+        return build_last_scraped_index(self.load(), key)
+
+    def __len__(self):
+        return len(self.load())
+
+    def export_excel(self, output_path):
+        export_excel(self.load(), output_path)
+
+
+class SQLiteHistoryStore:
+    """Append-only history in a SQLite table, indexed by url and name."""
+
+    def __init__(self, path):
+        self.path = path
+        with sqlite3.connect(self.path) as con:
+            con.execute(
+                "CREATE TABLE IF NOT EXISTS history ("
+                "url TEXT, name TEXT, pack_weight TEXT, overall_price REAL, "
+                "price_per_unit REAL, unit TEXT, scraped_at TEXT)"
+            )
+            con.execute("CREATE INDEX IF NOT EXISTS idx_history_url ON history (url, scraped_at)")
+            con.execute("CREATE INDEX IF NOT EXISTS idx_history_name ON history (name, scraped_at)")
+
+    def load(self):
+        with sqlite3.connect(self.path) as con:
+            return complete_multipacks(pd.read_sql_query("SELECT * FROM history ORDER BY rowid", con))
+
+    def append(self, df):
+        df = _conform(df)
+        df = df.assign(scraped_at=pd.to_datetime(df["scraped_at"], errors="coerce").dt.strftime("%Y-%m-%d %H:%M:%S"))
+        with sqlite3.connect(self.path) as con:
+            df.to_sql("history", con, if_exists="append", index=False)
+
+    def last_scraped(self, key="url"):
+        if key not in ("url", "name"):
+            raise ValueError(f"Unsupported key: {key}")
+        with sqlite3.connect(self.path) as con:
+            rows = con.execute(
+                f"SELECT {key}, MAX(scraped_at) FROM history WHERE {key} IS NOT NULL GROUP BY {key}"
+            ).fetchall()
+        return {k: pd.Timestamp(v) for k, v in rows if v}
+
+    def __len__(self):
+        with sqlite3.connect(self.path) as con:
+            return con.execute("SELECT COUNT(*) FROM history").fetchone()[0]
+
+    def export_excel(self, output_path):
+        export_excel(self.load(), output_path)
+
+
+class ChangeOnlyHistoryStore:
+    """
+    SQLite history in change-only form (see compress_history): a row is
+    added only when a product's price, unit price or pack changes; otherwise
+    the product's latest row has its last_seen_at and seen_count updated.
+    load() returns the compact rows; load_dense() expands them.
+    A cut-short "6 X" pack is completed in place once a full scrape arrives.
+    Opening a plain SQLite store (SQLiteHistoryStore) this way converts its
+    history table in place, once.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with sqlite3.connect(self.path) as con:
+            con.execute(
+                "CREATE TABLE IF NOT EXISTS changes ("
+                "url TEXT, name TEXT, pack_weight TEXT, overall_price REAL, "
+                "price_per_unit REAL, unit TEXT, scraped_at TEXT, last_seen_at TEXT, seen_count INTEGER)"
+            )
+            con.execute("CREATE INDEX IF NOT EXISTS idx_changes_url ON changes (url, scraped_at)")
+            con.execute("CREATE INDEX IF NOT EXISTS idx_changes_name ON changes (name, scraped_at)")
+            migrated = self._migrate_history(con)
+        if migrated:
+            with sqlite3.connect(self.path) as con:
+                con.execute("VACUUM")  # Give the full history's pages back to the filesystem
+            print(f"🗜️ Converted {migrated} history rows in {path} to {len(self)} change rows")
+
+    def _migrate_history(self, con):
+        """Copies a plain store's history table into changes, then drops it; returns rows moved."""
+        has_history = con.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'history'"
+        ).fetchone() is not None
+        if not has_history or con.execute("SELECT COUNT(*) FROM changes").fetchone()[0]:
+            return 0
+        history = pd.read_sql_query("SELECT * FROM history ORDER BY rowid", con)
+        self._append(con, history)
+        con.execute("DROP TABLE history")
+        return len(history)
+
+    def load(self):
+        with sqlite3.connect(self.path) as con:
+            return complete_multipacks(pd.read_sql_query("SELECT * FROM changes ORDER BY rowid", con))
+
+    def load_dense(self, freq="D"):
+        return expand_history(self.load(), freq)
+
+    def append(self, df):
+        """Merges new visits into each product's latest change row, adding rows only for changes."""
+        with sqlite3.connect(self.path) as con:
+            self._append(con, df)
+
+    def _append(self, con, df):
+        latest = pd.read_sql_query(
+            "SELECT rowid AS _rowid, * FROM changes WHERE rowid IN "
+            "(SELECT MAX(rowid) FROM changes GROUP BY COALESCE(url, name))", con
+        )
+        incoming = df.reindex(columns=COMPACT_COLUMNS) if "last_seen_at" in df else _conform(df)
+        compact = compress_history(pd.concat([latest, incoming], ignore_index=True))
+        for col in ("scraped_at", "last_seen_at"):
+            compact[col] = compact[col].dt.strftime("%Y-%m-%d %H:%M:%S")
+
+        seen = compact[compact["_rowid"].notna()]
+        con.executemany(
+            "UPDATE changes SET pack_weight = ?, last_seen_at = ?, seen_count = ? WHERE rowid = ?",
+            zip(seen["pack_weight"].astype(object).where(seen["pack_weight"].notna(), None),
+                seen["last_seen_at"], seen["seen_count"].astype(int).tolist(), seen["_rowid"].astype(int).tolist()),
+        )
+        compact[compact["_rowid"].isna()][COMPACT_COLUMNS].to_sql("changes", con, if_exists="append", index=False)
+
+    def last_scraped(self, key="url"):
+        if key not in ("url", "name"):
+            raise ValueError(f"Unsupported key: {key}")
+        with sqlite3.connect(self.path) as con:
+            rows = con.execute(
+                f"SELECT {key}, MAX(last_seen_at) FROM changes WHERE {key} IS NOT NULL GROUP BY {key}"
+            ).fetchall()
+        return {k: pd.Timestamp(v) for k, v in rows if v}
+
+    def __len__(self):
+        with sqlite3.connect(self.path) as con:
+            return con.execute("SELECT COUNT(*) FROM changes").fetchone()[0]
+
+    def export_excel(self, output_path):
+        export_excel(self.load(), output_path)
+
+
+def _is_change_only(path):
+    """True for an existing SQLite file created by ChangeOnlyHistoryStore."""
+    if not os.path.exists(path):
+        return False
+    with sqlite3.connect(path) as con:
+        return con.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'changes'").fetchone() is not None
+
+
+class ParquetHistoryStore:
+    """
+    Append-only history as Parquet files partitioned by scrape date:
+    <dir>/scrape_date=YYYY-MM-DD/part-<id>.parquet. Requires pyarrow.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(self.path, exist_ok=True)
+
+    def _files(self):
+        return sorted(glob.glob(os.path.join(self.path, "scrape_date=*", "*.parquet")))
+
+    def load(self, columns=None):
+        files = self._files()
+        if not files:
+            return pd.DataFrame(columns=columns or HISTORY_COLUMNS)
+        return complete_multipacks(pd.concat([pd.read_parquet(f, columns=columns) for f in files], ignore_index=True))
+
+    def append(self, df):
+        df = _conform(df)
+        scrape_date = pd.to_datetime(df["scraped_at"], errors="coerce").dt.strftime("%Y-%m-%d").fillna("unknown")
+        for day, part in df.groupby(scrape_date):
+            part_dir = os.path.join(self.path, f"scrape_date={day}")
+            os.makedirs(part_dir, exist_ok=True)
+            part.to_parquet(os.path.join(part_dir, f"part-{uuid.uuid4().hex}.parquet"), index=False)
+
+    def last_scraped(self, key="url"):
+        return build_last_scraped_index(self.load(columns=[key, "scraped_at"]), key)
+
+    def __len__(self):
+        return len(self.load(columns=["scraped_at"]))
+
+    def export_excel(self, output_path):
+        export_excel(self.load(), output_path)
+
+
+def open_history_store(path, change_only=False):
+    """
+    Picks a backend from the path: .sqlite/.db, .xlsx, or a Parquet directory.
+    change_only=True (or an existing change-only file) gives the SQLite
+    change-only store; an existing plain SQLite store is converted to it.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext in (".sqlite", ".db"):
+        if change_only or _is_change_only(path):
+            return ChangeOnlyHistoryStore(path)
+        return SQLiteHistoryStore(path)
+    if change_only:
+        raise ValueError(f"Change-only history needs a .sqlite/.db path, got {path}")
+    if ext in (".xlsx", ".xls"):
+        return ExcelHistoryStore(path)
+    return ParquetHistoryStore(path)
+
+
+def compact_store(source_path, target_path):
+    """Converts any history store into a change-only SQLite store."""
+    source = open_history_store(source_path).load()
+    target = ChangeOnlyHistoryStore(target_path)
+    target.append(source)
+    print(f"🗜️ Compacted {len(source)} history rows to {len(target)} change rows in {target_path}")
+
+
+USAGE = """Usage:
+  python history_store.py <store> <output.xlsx>                    export
+  python history_store.py compact <store> <changes.sqlite>         convert to change-only form
+  python history_store.py expand <changes.sqlite> <output.xlsx> [freq]  dense series (default daily)"""
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if len(args) == 3 and args[0] == "compact":
+        compact_store(args[1], args[2])
+    elif len(args) in (3, 4) and args[0] == "expand":
+        export_excel(expand_history(compress_history(open_history_store(args[1]).load()), *args[3:]), args[2])
+    elif len(args) == 2:
+        open_history_store(args[0]).export_excel(args[1])
+    else:
+        raise SystemExit(USAGE)
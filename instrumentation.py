@@ -0,0 +1,220 @@
+# instrumentation.py
+#
+# Stage-level metrics for the pipeline entry points. Inside a
+# pipeline_run(), every stage() and record() call appends one JSON line to
+# NUTRITRACK_METRICS (default pipeline_metrics.jsonl; "0" turns the file
+# off). The lines hold wall time, rows in and out, current memory and the
+# peak memory during that stage.
+# Set NUTRITRACK_PROFILE=<dir> to also dump a cProfile of the whole run
+# there. Outside a run, stage() only times and prints, so library callers
+# (benchmarks, notebooks) pay nothing extra.
+
+import os
+import json
+import time
+import uuid
+import cProfile
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+METRICS_FILE = os.environ.get("NUTRITRACK_METRICS", "pipeline_metrics.jsonl")
+PROFILE_DIR = os.environ.get("NUTRITRACK_PROFILE", "")
+
+SAMPLE_SECONDS = 0.05  # RSS sampling interval where the high-water mark can't be reset
+
+_lock = threading.Lock()
+_local = threading.local()  # Per-thread stacks of open stage names and peak meters
+_run = None
+_hwm_resettable = None  # Whether /proc/self/clear_refs works; decided on first use
+
+
+# ----------------------------------------
+# Memory
+# ----------------------------------------
+def rss_mb():
+    """Current resident memory in MB from /proc (Linux), else None."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return round(pages * os.sysconf("SC_PAGE_SIZE") / 1e6, 1)
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _hwm_mb():
+    """Resident high-water mark in MB since the last reset (VmHWM, Linux), else None."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) * 1024 / 1e6, 1)
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def _reset_hwm():
+    """Resets VmHWM to the current RSS (Linux 4.0+); False where that isn't possible."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+class _PeakMeter:
+    """
+    Peak resident memory over one stage. On Linux the kernel's high-water
+    mark is reset when the stage starts and read when it ends; before a
+    nested stage resets it, the parent's peak so far is folded into the
+    parent, and the child's peak is folded in when it ends. Elsewhere a
+    thread samples current RSS. peak stays None where neither works.
+    Stages running at the same time in other threads share the process mark.
+    """
+
+    def __init__(self):
+        global _hwm_resettable
+        self.peak = None
+        self._sampler = None
+        meters = getattr(_local, "meters", None)
+        if meters is None:
+            meters = _local.meters = []
+        self._meters = meters
+        if _hwm_resettable is not False:
+            if meters:
+                meters[-1].fold(_hwm_mb())
+            _hwm_resettable = _reset_hwm()
+        if _hwm_resettable:
+            self.fold(_hwm_mb())
+        elif rss_mb() is not None:
+            self._stopped = threading.Event()
+            self._sampler = threading.Thread(target=self._sample, daemon=True)
+            self._sampler.start()
+        meters.append(self)
+
+    def fold(self, mb):
+        if mb is not None:
+            self.peak = mb if self.peak is None else max(self.peak, mb)
+
+    def _sample(self):
+        self.fold(rss_mb())
+        while not self._stopped.wait(SAMPLE_SECONDS):
+            self.fold(rss_mb())
+
+    def stop(self):
+        """Ends the measurement; returns the peak in MB (None if unavailable)."""
+        self._meters.remove(self)
+        if self._sampler is not None:
+            self._stopped.set()
+            self._sampler.join()
+            self.fold(rss_mb())
+        elif _hwm_resettable:
+            self.fold(_hwm_mb())
+        if self._meters:
+            self._meters[-1].fold(self.peak)
+        return self.peak
+
+
+# ----------------------------------------
+# Output
+# ----------------------------------------
+def record(kind, **fields):
+    """Appends one JSON line for the active run (no-op outside pipeline_run)."""
+    run = _run
+    if run is None or not run["path"]:
+        return
+    line = json.dumps({
+        "ts": datetime.now().isoformat(timespec="milliseconds"),
+        "run_id": run["id"],
+        "pipeline": run["name"],
+        "kind": kind,
+        **fields,
+    }, default=str)
+    with _lock:
+        run["file"].write(line + "\n")
+
+
+class Stage:
+    """Handle yielded by stage(); set rows_out (and rows_in) before the block ends."""
+
+    def __init__(self, name, rows_in=None):
+        self.name = name
+        self.rows_in = rows_in
+        self.rows_out = None
+        self.seconds = None
+
+
+@contextmanager
+def stage(name, rows_in=None, quiet=False):
+    """
+    Times a named pipeline stage and records wall time, rows in/out, current
+    RSS and the peak RSS during the stage. Nested stages are named
+    parent/child; a parent's peak includes its children's.
+    """
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    stack.append(name)
+    handle = Stage("/".join(stack), rows_in)
+    meter = _PeakMeter()
+    start = time.perf_counter()
+    status = "ok"
+    try:
+        yield handle
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        handle.seconds = time.perf_counter() - start
+        stack.pop()
+        peak = meter.stop()
+        record("stage", stage=handle.name, status=status, seconds=round(handle.seconds, 4),
+               rows_in=handle.rows_in, rows_out=handle.rows_out, rss_mb=rss_mb(), peak_rss_mb=peak)
+        if not quiet:
+            rows = f", {handle.rows_out} rows" if handle.rows_out is not None else ""
+            mem = f", peak {peak:.0f} MB" if peak is not None else ""
+            print(f"⏱️ {handle.name}: {handle.seconds:.2f}s{rows}{mem}")
+
+
+@contextmanager
+def pipeline_run(name, metrics_path=None, profile_dir=None):
+    """
+    Wraps one run of an entry point: opens the metrics file, optionally
+    profiles the run, and records a final 'run' line with the total time.
+    """
+    global _run
+    metrics_path = METRICS_FILE if metrics_path is None else metrics_path
+    profile_dir = PROFILE_DIR if profile_dir is None else profile_dir
+    if metrics_path == "0":
+        metrics_path = ""
+
+    run = {"id": uuid.uuid4().hex[:12], "name": name, "path": metrics_path, "file": None}
+    if metrics_path:
+        run["file"] = open(metrics_path, "a", buffering=1, encoding="utf-8")
+    profiler = cProfile.Profile() if profile_dir else None
+
+    previous, _run = _run, run
+    meter = _PeakMeter()
+    start = time.perf_counter()
+    status = "ok"
+    if profiler:
+        profiler.enable()
+    try:
+        yield run
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        if profiler:
+            profiler.disable()
+            os.makedirs(profile_dir, exist_ok=True)
+            profile_path = os.path.join(profile_dir, f"{name}-{run['id']}.prof")
+            profiler.dump_stats(profile_path)
+            print(f"🔬 Profile saved to {profile_path}")
+        record("run", status=status, seconds=round(time.perf_counter() - start, 4),
+               rss_mb=rss_mb(), peak_rss_mb=meter.stop())
+        _run = previous
+        if run["file"]:
+            run["file"].close()
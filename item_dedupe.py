@@ -0,0 +1,203 @@
+# item_dedupe.py
+#
+# Near-duplicate item detection for the product-code registry. Names like
+# "semi-skimmed milk 2l" and "Semi Skimmed Milk 2 L" get one code.
+# Candidate pairs come from a prefix-filtered trigram inverted index, so
+# most pairs are never compared. Each candidate pair is scored by trigram
+# Jaccard similarity, and pairs above the threshold are grouped with
+# union-find. Names must contain the same numbers (sizes, counts), so
+# "milk 1l" and "milk 2l" stay apart.
+#
+# Usage: python item_dedupe.py [registry.sqlite] [--threshold 0.8] [--apply] [--out proposals.xlsx]
+#                              [--export lookup.xlsx]
+# Without --apply, proposed merges are only written to the proposals sheet.
+# With --apply, the registry's Excel lookup is refreshed: by default the
+# registry's own name with .xlsx (item_lookup.xlsx, mock_lookup.xlsx), in
+# the mock layout when the registry holds only mock items.
+
+import os
+import re
+import math
+import time
+import argparse
+from collections import Counter
+import pandas as pd
+from code_registry import CodeRegistry, LOOKUP_COLUMNS, MOCK_STORE, MOCK_EXPORT_COLUMNS
+from excel_output import write_excel
+
+DEFAULT_REGISTRY = "item_lookup.sqlite"
+DEFAULT_THRESHOLD = 0.8
+PROPOSALS_FILE = "dedupe_proposals.xlsx"
+
+
+# ----------------------------------------
+# Normalisation
+# ----------------------------------------
+def canonical_names(names):
+    """
+    Vectorized canonical form: lower case, punctuation as spaces, numbers
+    split from units ("2l" -> "2 l"), single spaces.
+    """
+    text = pd.Series(names, dtype="string").str.lower()
+    text = text.str.replace(r"[^0-9a-z]+", " ", regex=True)
+    text = text.str.replace(r"(?<=\d)(?=[a-z])|(?<=[a-z])(?=\d)", " ", regex=True)
+    return text.str.replace(r"\s+", " ", regex=True).str.strip()
+
+
+def trigrams(name):
+    padded = f" {name} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+# ----------------------------------------
+# Candidate generation and scoring
+# ----------------------------------------
+def similar_pairs(names, threshold=DEFAULT_THRESHOLD):
+    """
+    Pairs (i, j, score) of canonical names with trigram Jaccard >= threshold
+    and identical numbers. The inverted index is keyed by (numbers, trigram),
+    so names are only ever compared within their number block. Inside a
+    block, AllPairs-style prefix filtering applies: tokens are ordered
+    rarest first and only each name's first len - ceil(threshold * len) + 1
+    tokens are indexed. Any pair above the threshold must share one of those.
+    """
+    grams = [trigrams(name) for name in names]
+    numbers = [tuple(re.findall(r"\d+", name)) for name in names]
+    frequency = Counter(gram for gs in grams for gram in gs)
+    rank = {gram: r for r, (gram, _) in enumerate(sorted(frequency.items(), key=lambda kv: (kv[1], kv[0])))}
+    tokens = [sorted(rank[g] for g in gs) for gs in grams]
+    sets = [set(ts) for ts in tokens]
+
+    index = {}
+    pairs = []
+    for x in sorted(range(len(names)), key=lambda i: len(tokens[i])):
+        size = len(tokens[x])
+        if size == 0:
+            continue
+        prefix = tokens[x][:size - math.ceil(threshold * size) + 1]
+        block = numbers[x]
+        seen = set()
+        for token in prefix:
+            for y in index.get((block, token), ()):
+                if y in seen:
+                    continue
+                seen.add(y)
+                if len(tokens[y]) < threshold * size:
+                    continue
+                overlap = len(sets[x] & sets[y])
+                score = overlap / (size + len(tokens[y]) - overlap)
+                if score >= threshold:
+                    pairs.append((y, x, score))
+        for token in prefix:
+            index.setdefault((block, token), []).append(x)
+    return pairs
+
+
+def cluster(count, pairs):
+    """Union-find over pair indices; returns a cluster id per index."""
+    parent = list(range(count))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for a, b, _ in pairs:
+        ra, rb = find(a), find(b)
+        if ra != rb:
+            parent[max(ra, rb)] = min(ra, rb)
+    return [find(i) for i in range(count)]
+
+
+# ----------------------------------------
+# Merge proposals
+# ----------------------------------------
+def propose_merges(lookup, threshold=DEFAULT_THRESHOLD):
+    """
+    Groups near-duplicate item_clean names (across stores) in a
+    store/item_clean/productCode lookup frame. Returns the rows whose code
+    would change, with the cluster's code, representative name and best
+    match score. A cluster keeps the code used by most rows (lowest on
+    ties).
+    """
+    lookup = lookup[LOOKUP_COLUMNS].dropna().reset_index(drop=True)
+    canonical = canonical_names(lookup["item_clean"].astype(str))
+    codes, distinct = pd.factorize(canonical)
+    distinct = list(distinct)
+
+    pairs = similar_pairs(distinct, threshold)
+    clusters = cluster(len(distinct), pairs)
+    best = {}
+    for a, b, score in pairs:
+        best[a] = max(best.get(a, 0.0), score)
+        best[b] = max(best.get(b, 0.0), score)
+
+    lookup["canonical"] = canonical.to_numpy()
+    lookup["cluster"] = [clusters[c] for c in codes]
+    lookup["match_score"] = [1.0 if best.get(c) is None else best[c] for c in codes]
+    lookup["productCode"] = lookup["productCode"].astype("int64")
+
+    # Winning code per cluster: most rows, then lowest code
+    counts = lookup.groupby(["cluster", "productCode"]).size().rename("rows").reset_index()
+    winners = (
+        counts.sort_values(["cluster", "rows", "productCode"], ascending=[True, False, True])
+              .drop_duplicates("cluster")
+              .set_index("cluster")["productCode"]
+    )
+    lookup["merged_code"] = lookup["cluster"].map(winners)
+    lookup["representative"] = lookup["cluster"].map(lambda c: distinct[c])
+
+    changes = lookup[lookup["merged_code"] != lookup["productCode"]]
+    return changes[LOOKUP_COLUMNS + ["merged_code", "representative", "match_score"]].reset_index(drop=True)
+
+
+def apply_merges(registry, proposals):
+    """Points every proposed store/item_clean at its cluster's code in the registry."""
+    registry.reassign_codes(
+        proposals[["store", "item_clean", "merged_code"]].rename(columns={"merged_code": "productCode"})
+    )
+
+
+def lookup_export(registry_path, lookup):
+    """
+    (path, columns) of the Excel lookup exported from a registry: its own
+    name with .xlsx, and the mock name_clean layout for mock-only registries.
+    """
+    path = os.path.splitext(registry_path)[0] + ".xlsx"
+    mock = not lookup.empty and (lookup["store"] == MOCK_STORE).all()
+    return path, MOCK_EXPORT_COLUMNS if mock else None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Find and merge near-duplicate item names in a code registry.")
+    parser.add_argument("registry", nargs="?", default=DEFAULT_REGISTRY)
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="Trigram Jaccard similarity")
+    parser.add_argument("--apply", action="store_true", help="Update the registry with the merged codes")
+    parser.add_argument("--out", default=PROPOSALS_FILE, help="Where to write the proposed merges")
+    parser.add_argument("--export", default=None, help="Excel lookup to refresh after --apply "
+                                                       "(default: the registry's name with .xlsx)")
+    args = parser.parse_args(argv)
+
+    with CodeRegistry(args.registry) as registry:
+        lookup = registry.lookup_frame()
+        start = time.perf_counter()
+        proposals = propose_merges(lookup, args.threshold)
+        elapsed = time.perf_counter() - start
+        print(f"🔎 Checked {lookup['item_clean'].nunique()} distinct names in {elapsed:.1f}s: "
+              f"{len(proposals)} codes to merge")
+
+        write_excel(proposals, args.out, sheet_name="Merges")
+        print(f"📝 Proposed merges written to {args.out}")
+
+        if args.apply and not proposals.empty:
+            apply_merges(registry, proposals)
+            export_path, columns = lookup_export(args.registry, lookup)
+            registry.export_excel(args.export or export_path, columns=columns)
+            rerun = "build_mock_data.py" if columns else "update_receipt_lookup.py --full"
+            print(f"✅ Merged {len(proposals)} codes in {args.registry}. "
+                  f"Re-run {rerun} to re-code existing rows.")
+
+
+if __name__ == "__main__":
+    main()
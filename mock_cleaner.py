@@ -3,16 +3,18 @@
 import sys
 import os
 import pandas as pd
-from openpyxl.utils import get_column_letter
-
-
-AUTO_CODE_START = 90000000  # Base for autogenerated codes
+from product_codes import assign_codes
+from code_registry import MOCK_STORE, MOCK_EXPORT_COLUMNS
+from cached_io import read_excel_cached
+from excel_stream import CHUNK_ROWS, iter_excel_chunks
+from excel_output import write_excel
+from schema import compact_frame, concat_compact, report_memory
 
 # ----------------------------------------
 # Step 1: Clean 'Statements' tab
 # ----------------------------------------
-def clean_mock_statements(file_path, tab_name="Statements"):
-    df = pd.read_excel(file_path, sheet_name=tab_name)
+def clean_mock_frame(df):
+    """Cleans raw 'Statements' rows (one whole sheet or one chunk of it)."""
     df.columns = df.columns.str.strip()
 
     # Convert date and price
@@ -35,71 +37,96 @@ def clean_mock_statements(file_path, tab_name="Statements"):
 
     # Drop original 'name' column
     df = df.drop(columns=['name'])
+    return df
+
+
+def iter_clean_mock_statements(file_path, tab_name="Statements", chunksize=CHUNK_ROWS):
+    """Streams cleaned statements chunk by chunk; memory stays flat in the workbook size."""
+    for chunk in iter_excel_chunks(file_path, sheet_name=tab_name, chunksize=chunksize):
+        yield clean_mock_frame(chunk)
+
+
+def clean_mock_statements(file_path, tab_name="Statements", chunksize=None):
+    """
+    Loads and cleans the 'Statements' tab.
+    With chunksize, the sheet is streamed and cleaned in chunks (same result);
+    only the compacted cleaned chunks are kept in memory.
+    Returns compact dtypes (see schema.py).
+    """
+    if chunksize:
+        df = concat_compact(iter_clean_mock_statements(file_path, tab_name, chunksize))
+    else:
+        df = compact_frame(clean_mock_frame(read_excel_cached(file_path, sheet_name=tab_name)))
 
     print(f"✅ Cleaned {len(df)} rows from '{tab_name}' tab")
+    report_memory(df, f"Cleaned {os.path.basename(file_path)}")
     return df
 
 # ----------------------------------------
 # Step 2: Save cleaned data with readable columns
 # ----------------------------------------
-def save_cleaned(df, output_path="mock_cleaned.xlsx"):
-    with pd.ExcelWriter(output_path, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name="Cleaned")
-        worksheet = writer.sheets["Cleaned"]
-        for i, col in enumerate(df.columns, 1):
-            max_len = max(df[col].astype(str).map(len).max(), len(col)) + 2
-            worksheet.column_dimensions[get_column_letter(i)].width = max_len
+def save_cleaned(df, output_path="mock_cleaned.xlsx", formatting=True):
+    write_excel(df, output_path, sheet_name="Cleaned", formatting=formatting)
 
     print(f"✅ Cleaned mock statements saved to {output_path}")
 
 # ----------------------------------------
 # Step 3: Create or update a stable lookup
 # ----------------------------------------
-def create_mock_lookup(df, lookup_path="mock_lookup.xlsx"):
+def _registry_lookup(registry):
+    """Mock entries of a CodeRegistry as a name_clean/productCode lookup frame."""
+    lookup_df = registry.lookup_frame()
+    lookup_df = lookup_df[lookup_df["store"] == MOCK_STORE]
+    return lookup_df[list(MOCK_EXPORT_COLUMNS)].rename(columns=MOCK_EXPORT_COLUMNS).reset_index(drop=True)
+
+
+def create_mock_lookup(df, lookup_path="mock_lookup.xlsx", registry=None):
     """
     Builds/updates a stable lookup table for mock items.
     Auto-generates numeric codes if missing.
+    If a CodeRegistry is given, codes are read from and upserted into it
+    instead of the Excel file at lookup_path.
     """
-    if os.path.exists(lookup_path):
-        lookup_df = pd.read_excel(lookup_path, dtype={"productCode": "Int64"})
+    if registry is not None:
+        lookup_df = _registry_lookup(registry)
+    elif os.path.exists(lookup_path):
+        lookup_df = read_excel_cached(lookup_path, dtype={"productCode": "Int64"})
     else:
         lookup_df = pd.DataFrame(columns=["name_clean", "productCode"])
 
-    updated_records = []
+    # Existing codes: first lookup entry per name_clean wins
+    name_key = df["name_clean"].map(str).str.strip()
+    known = lookup_df.drop_duplicates(subset="name_clean").set_index("name_clean")["productCode"]
+    codes = name_key.map(known).astype("Int64")
+
+    # Generate stable codes once per unique new name, avoiding codes in use
+    missing = ~name_key.isin(known.index)
+    owned = lookup_df.dropna(subset=["productCode"])
+    taken = {int(code): str(name) for name, code in zip(owned["name_clean"], owned["productCode"])}
+    assigned = assign_codes(name_key[missing].unique(), taken)
+    codes[missing] = name_key[missing].map(assigned)
 
-    for _, row in df.iterrows():
-        name_clean = str(row["name_clean"]).strip()
+    # Add codes to df
+    df["productCode"] = codes
 
-        # Check for existing code
-        match = lookup_df[lookup_df["name_clean"] == name_clean]
-        if not match.empty:
-            code = int(match["productCode"].iloc[0])
-        else:
-            # Generate new code
-            code = AUTO_CODE_START + (abs(hash(name_clean)) % 10000000)
-            updated_records.append({
-                "name_clean": name_clean,
-                "productCode": code
-            })
+    # New lookup entries, in first-seen order
+    new_names = name_key[missing].drop_duplicates()
+    updated_records = pd.DataFrame({"name_clean": new_names.to_numpy(), "productCode": new_names.map(assigned).to_numpy()})
 
-        # Add code to df
-        df.loc[row.name, "productCode"] = code
+    if registry is not None:
+        registry.upsert_many(updated_records.rename(columns={"name_clean": "item_clean"}).assign(store=MOCK_STORE))
+        return df, _registry_lookup(registry)
 
     # Merge new records into lookup
-    if updated_records:
-        lookup_df = pd.concat([lookup_df, pd.DataFrame(updated_records)], ignore_index=True)
+    if not updated_records.empty:
+        lookup_df = pd.concat([lookup_df, updated_records], ignore_index=True)
 
     # Remove duplicates and sort
     lookup_df = lookup_df.drop_duplicates(subset=["name_clean", "productCode"])
     lookup_df = lookup_df.sort_values("name_clean").reset_index(drop=True)
 
     # Save lookup
-    with pd.ExcelWriter(lookup_path, engine='openpyxl') as writer:
-        lookup_df.to_excel(writer, index=False, sheet_name="Lookup")
-        worksheet = writer.sheets["Lookup"]
-        for i, col in enumerate(lookup_df.columns, 1):
-            max_len = max(lookup_df[col].astype(str).map(len).max(), len(col)) + 2
-            worksheet.column_dimensions[get_column_letter(i)].width = max_len
+    write_excel(lookup_df, lookup_path, sheet_name="Lookup")
 
     print(f"✅ Lookup table updated at {lookup_path}")
     return df, lookup_df
@@ -1,42 +1,237 @@
 # mock_summary.py
+#
+# python mock_summary.py            one-off summary and plot prompt
+# python mock_summary.py --session  load once, then answer repeated commands
 
+import os
+import sys
+import cmd
+import time
 import pandas as pd
-from utils import pick_file_gui
+from cached_io import read_excel_cached
+from rollup_store import RollupStore, aggregate_mock
+from schema import compact_frame, report_memory
 from price_analysis_mock import (
-    calculate_weighted_averages,
+    weighted_averages_from_rollup,
+    ItemSearchIndex,
     plot_item_prices,
-    get_top_items_with_quantity_and_value,
-    get_top_selling_items,
+    top_items_from_rollup,
+    top_selling_from_rollup,
     unique_items,
-    buy_sell_summary
+    buy_sell_summary,
+    format_buy_sell
 )
 
 FINAL_CLEANED_FILE = "mock_cleaned.xlsx"  # The single cleaned file with codes
+ROLLUP_DB = "mock_rollup.sqlite"          # Monthly rollup kept up to date by build_mock_data.py
 
-def main():
-    print("=== MOCK STATEMENTS SUMMARY ===")
-
-    # Step 1: Load cleaned mock statements
-    try:
-        df = pd.read_excel(FINAL_CLEANED_FILE)
-    except FileNotFoundError:
+def load_mock_rollup():
+    """The mock monthly rollup (name_clean, month, state, sums), rebuilt only if the cleaned file changed."""
+    if not os.path.exists(FINAL_CLEANED_FILE):
         raise SystemExit(f"❌ {FINAL_CLEANED_FILE} not found. Run build_mock_data.py first.")
+    with RollupStore(ROLLUP_DB) as rollup:
+        if rollup.sync(FINAL_CLEANED_FILE, lambda: aggregate_mock(read_excel_cached(FINAL_CLEANED_FILE))):
+            print(f"📊 Rollup rebuilt from {FINAL_CLEANED_FILE}")
+        cube = compact_frame(rollup.frame().rename(columns={'item': 'name_clean'}))
+    report_memory(cube, "Mock rollup")
+    return cube
+
+
+# ----------------------------------------
+# Interactive session
+# ----------------------------------------
+class MockSession:
+    """
+    Everything the summary commands need, loaded and aggregated once: the
+    rollup, price trends with their search index, per-item totals already
+    ranked, and monthly buy/sell totals for date-range queries. refresh()
+    reloads only when the cleaned file's mtime or size changed.
+    """
+
+    def __init__(self, path=FINAL_CLEANED_FILE):
+        self.path = path
+        self.signature = None
+        self.refresh()
+
+    def _file_signature(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def refresh(self, force=False):
+        """Reloads if the cleaned file changed since the last load; returns True if it did."""
+        signature = self._file_signature()
+        if signature is None and self.signature is not None:
+            print(f"⚠️ {self.path} is missing; keeping the data already loaded.")
+            return False
+        if signature == self.signature and not force:
+            return False
+
+        cube = load_mock_rollup()
+        self.cube = cube
+        self.price_trends = weighted_averages_from_rollup(cube)
+        self.index = ItemSearchIndex(self.price_trends)
+        self.item_totals = (
+            cube.groupby('name_clean', observed=True)
+            .agg(trade_count=('line_count', 'sum'), total_quantity=('quantity', 'sum'), total_value=('line_value', 'sum'))
+            .sort_values('trade_count', ascending=False, kind='stable')
+        )
+        self.sales = (
+            cube[cube['state'] == 'SOLD'].groupby('name_clean', observed=True)['line_value']
+            .sum().rename('total_sale').sort_values(ascending=False, kind='stable')
+        )
+        self.monthly = (
+            cube.groupby(['month', 'state'], observed=True)['total_value'].sum()
+            .unstack('state').rename(columns=str)
+            .reindex(columns=['BOUGHT', 'SOLD']).fillna(0).sort_index()
+        )
+        self.signature = signature
+        return True
+
+    def top_items(self, n=5):
+        """top_items_from_rollup, from the precomputed ranking."""
+        top = self.item_totals.head(n).copy()
+        top['total_value'] = top['total_value'].apply(lambda x: f"£{x:,.2f}")
+        return top
+
+    def top_selling(self, n=5):
+        """top_selling_from_rollup, from the precomputed ranking."""
+        return self.sales.head(n).apply(lambda x: f"£{x:,.2f}").to_string()
+
+    def buy_sell(self, start=None, end=None):
+        """buy_sell_summary over the months from start to end (inclusive, either may be None)."""
+        start, end = (None if d is None else pd.Timestamp(d).to_period('M').to_timestamp() for d in (start, end))
+        totals = self.monthly.loc[start:end].sum()
+        return format_buy_sell(totals['BOUGHT'], totals['SOLD'])
+
+
+class MockShell(cmd.Cmd):
+    """Command loop over a MockSession. Before each command it checks whether the cleaned file changed."""
+
+    intro = "Commands: search, plot, top, sales, range, summary, reload, quit (help <command> for details)"
+    prompt = "mock> "
+
+    def __init__(self, session):
+        super().__init__()
+        self.session = session
+
+    def precmd(self, line):
+        if line.strip() and line.split()[0] not in ("quit", "exit", "EOF", "reload"):
+            if self.session.refresh():
+                print(f"🔄 {self.session.path} changed; data reloaded.")
+        self._start = time.perf_counter()
+        return line
+
+    def postcmd(self, stop, line):
+        if line.strip() and not stop:
+            print(f"({(time.perf_counter() - self._start) * 1000:.1f} ms)")
+        return stop
+
+    def emptyline(self):
+        pass
 
-    # Step 1a: Ensure 'name' exists for analysis
-    df['name'] = df['name_clean']
+    def default(self, line):
+        print(f"Unknown command: {line}. Type help for the list.")
+
+    def _count(self, arg, default=5):
+        try:
+            return int(arg) if arg.strip() else default
+        except ValueError:
+            print(f"Not a number: {arg}")
+            return None
+
+    def do_search(self, arg):
+        """search <term>: list items whose name contains term."""
+        matches = self.session.index.search(arg.strip())
+        print("\n".join(map(str, matches)) if matches else f"No items found matching: {arg.strip()}")
+        print(f"{len(matches)} match(es)")
+
+    def do_plot(self, arg):
+        """plot <term>: plot price trends for items matching term."""
+        if not arg.strip():
+            print("Usage: plot <term>")
+            return
+        plot_item_prices(self.session.price_trends, arg.strip(), index=self.session.index)
+
+    def do_top(self, arg):
+        """top [n]: the n most frequently traded items (default 5)."""
+        n = self._count(arg)
+        if n is not None:
+            print(self.session.top_items(n))
+
+    def do_sales(self, arg):
+        """sales [n]: the n items with the highest sales value (default 5)."""
+        n = self._count(arg)
+        if n is not None:
+            print(self.session.top_selling(n))
+
+    def do_range(self, arg):
+        """range <start> [end]: buy/sell totals for the months from start to end, e.g. range 2024-01 2024-06."""
+        parts = arg.split()
+        if not 1 <= len(parts) <= 2:
+            print("Usage: range <start> [end]")
+            return
+        try:
+            summary = self.session.buy_sell(parts[0], parts[1] if len(parts) > 1 else None)
+        except ValueError:
+            print(f"Could not read dates: {arg}")
+            return
+        for k, v in summary.items():
+            print(f"{k}: {v}")
+
+    def do_summary(self, arg):
+        """summary: buy/sell totals for all months."""
+        for k, v in self.session.buy_sell().items():
+            print(f"{k}: {v}")
+
+    def do_reload(self, arg):
+        """reload: reload the data even if the file looks unchanged."""
+        self.session.refresh(force=True)
+        print(f"🔄 Reloaded {len(self.session.index)} items.")
+
+    def do_quit(self, arg):
+        """quit: leave the session."""
+        return True
+
+    do_exit = do_quit
+
+    def do_EOF(self, arg):
+        print()
+        return True
+
+
+def run_session():
+    """Loads once, then answers commands until quit."""
+    print("=== MOCK STATEMENTS SESSION ===")
+    session = MockSession()
+    print(f"🧾 {len(session.index)} items loaded.")
+    MockShell(session).cmdloop()
+
+
+def main(session=False):
+    if session:
+        return run_session()
+
+    print("=== MOCK STATEMENTS SUMMARY ===")
+
+    # Step 1: Load the monthly rollup
+    df = load_mock_rollup()
 
     # Step 2: Weighted price trends
-    price_trends = calculate_weighted_averages(df)
+    price_trends = weighted_averages_from_rollup(df)
+    search_index = ItemSearchIndex(price_trends)
 
     # Step 3: Summary statistics
     num_unique = unique_items(df)
     print(f"\n🧾 Number of Unique Items Traded: {num_unique}")
 
-    top_items = get_top_items_with_quantity_and_value(df, n=5)
+    top_items = top_items_from_rollup(df, n=5)
     print("\n📦 Top 5 Most Frequently Traded Items (with Quantity & Value):")
     print(top_items)
 
-    top_sales = get_top_selling_items(df, n=5)
+    top_sales = top_selling_from_rollup(df, n=5)
     print("\n Top 5 Items by Total Sales (£):")
     print(top_sales)
     
@@ -47,11 +242,14 @@ def main():
     print()
 
     # Step 4: Optional price trend plot
-    search_term = input("\n🔍 Enter item name to plot trends (or leave blank to skip): ").strip()
+    try:
+        search_term = input("\n🔍 Enter item name to plot trends (or leave blank to skip): ").strip()
+    except EOFError:  # No interactive input (cron, pipes)
+        search_term = ""
     if search_term:
-        plot_item_prices(price_trends, search_term)
+        plot_item_prices(price_trends, search_term, index=search_index)
     else:
         print("No item entered. Skipping plot.")
 
 if __name__ == "__main__":
-    main()
+    main(session="--session" in sys.argv)
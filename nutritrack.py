@@ -0,0 +1,198 @@
+# nutritrack.py
+#
+# One command for every pipeline step:
+#   python nutritrack.py scrape [--workers N]
+#   python nutritrack.py schedule [--budget N] [--daemon]
+#   python nutritrack.py receipts update [--full] [--chunksize N]
+#   python nutritrack.py receipts summary [--no-cleaned]
+#   python nutritrack.py mock build [paths ...] [--workers N] [--chunksize N]
+#   python nutritrack.py mock summary [--session]
+#   python nutritrack.py mock charts [output_dir] [--search TERM]
+#   python nutritrack.py dedupe [registry] [--apply] ...
+#   python nutritrack.py bench [--sizes 10k,100k] ...
+#   python nutritrack.py history export <store> <output.xlsx>
+#   python nutritrack.py history compact <store> <changes.sqlite>
+#   python nutritrack.py history expand <store> <output.xlsx> [--freq D]
+#   python nutritrack.py pages replay|stats ...
+#
+# Only the standard library is imported up front. Each subcommand imports
+# its own module when it runs, so pandas, matplotlib, openpyxl, bs4 and
+# tkinter load only for the steps that use them. The file picker (tkinter)
+# is only opened when a step needs a file and none was given. Use
+# --import-time to print how long startup and the step's imports took;
+# `python -X importtime nutritrack.py ...` breaks that down per module.
+
+import sys
+import time
+import argparse
+import importlib
+
+_START = time.perf_counter()
+
+HEAVY_MODULES = ["pandas", "numpy", "matplotlib", "openpyxl", "xlsxwriter", "bs4", "requests", "tkinter"]
+
+
+# ----------------------------------------
+# Lazy loading
+# ----------------------------------------
+def load(module_name, report=False):
+    """Imports a pipeline module on demand; with report=True prints the time and heavy libraries it pulled in."""
+    before = {name for name in HEAVY_MODULES if name in sys.modules}
+    start = time.perf_counter()
+    module = importlib.import_module(module_name)
+    elapsed = time.perf_counter() - start
+    if report:
+        loaded = [name for name in HEAVY_MODULES if name in sys.modules and name not in before]
+        print(f"⏱️ startup {(start - _START) * 1000:.0f} ms, import {module_name} {elapsed * 1000:.0f} ms"
+              f" ({', '.join(loaded) or 'no heavy libraries'})")
+    return module
+
+
+# ----------------------------------------
+# Subcommands
+# ----------------------------------------
+def run_scrape(args):
+    scraper = load("Scraper", args.import_time)
+    scraper.main(max_workers=args.workers or scraper.MAX_WORKERS)
+
+
+def run_schedule(args):
+    scheduler = load("scrape_scheduler", args.import_time)
+    try:
+        scheduler.main(args.budget or scheduler.DEFAULT_BUDGET, args.daemon,
+                       max_workers=args.workers or scheduler.MAX_WORKERS)
+    except KeyboardInterrupt:
+        print("\n👋 Scheduler stopped")
+
+
+def run_receipts_update(args):
+    load("update_receipt_lookup", args.import_time).main(full=args.full, chunksize=args.chunksize)
+
+
+def run_receipts_summary(args):
+    load("receipt_summary", args.import_time).main(include_cleaned=not args.no_cleaned)
+
+
+def run_mock_build(args):
+    build = load("build_mock_data", args.import_time)
+    build.main(build.resolve_mock_files(args.paths), workers=args.workers, chunksize=args.chunksize)
+
+
+def run_mock_summary(args):
+    load("mock_summary", args.import_time).main(session=args.session)
+
+
+def run_mock_charts(args):
+    load("render_price_charts", args.import_time).main(args.output_dir, args.search, workers=args.workers)
+
+
+def run_dedupe(args):
+    load("item_dedupe", args.import_time).main(args.passthrough)
+
+
+def run_bench(args):
+    return load("benchmark_suite", args.import_time).main(args.passthrough)
+
+
+def run_pages(args):
+    load("page_cache", args.import_time).main(args.passthrough)
+
+
+def run_history_export(args):
+    load("history_store", args.import_time).open_history_store(args.store).export_excel(args.output)
+
+
+def run_history_compact(args):
+    load("history_store", args.import_time).compact_store(args.store, args.output)
+
+
+def run_history_expand(args):
+    history = load("history_store", args.import_time)
+    compact = history.compress_history(history.open_history_store(args.store).load())
+    history.export_excel(history.expand_history(compact, args.freq), args.output)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="nutritrack", description="NutriTrack pipeline commands.")
+    parser.add_argument("--import-time", action="store_true", help="Report startup and import time")
+    commands = parser.add_subparsers(dest="command", metavar="command", required=True)
+
+    scrape = commands.add_parser("scrape", help="Scrape product pages that are not fresh")
+    scrape.add_argument("--workers", type=int, default=None, help="Concurrent fetches (default: Scraper.MAX_WORKERS)")
+    scrape.set_defaults(func=run_scrape)
+
+    schedule = commands.add_parser("schedule", help="Scrape the products that are due, by adaptive revisit interval")
+    schedule.add_argument("--budget", type=int, default=None, help="Maximum fetches per run (default 200)")
+    schedule.add_argument("--daemon", action="store_true", help="Keep running and scrape products as they fall due")
+    schedule.add_argument("--workers", type=int, default=None, help="Concurrent fetches")
+    schedule.set_defaults(func=run_schedule)
+
+    receipts = commands.add_parser("receipts", help="Receipt steps").add_subparsers(
+        dest="step", metavar="step", required=True)
+    update = receipts.add_parser("update", help="Clean and code new receipts")
+    update.add_argument("--full", action="store_true", help="Rebuild everything instead of the changed rows")
+    update.add_argument("--chunksize", type=int, default=None, help="Stream the raw sheet in chunks of this many rows")
+    update.set_defaults(func=run_receipts_update)
+    summary = receipts.add_parser("summary", help="Write the receipt summary workbook")
+    summary.add_argument("--no-cleaned", action="store_true", help="Leave out the full cleaned sheet (faster)")
+    summary.set_defaults(func=run_receipts_summary)
+
+    mock = commands.add_parser("mock", help="Mock statement steps").add_subparsers(
+        dest="step", metavar="step", required=True)
+    build = mock.add_parser("build", help="Clean statement workbooks and rebuild the rollup")
+    build.add_argument("paths", nargs="*", help="Files, directories or glob patterns (file picker if none)")
+    build.add_argument("--workers", type=int, default=None)
+    build.add_argument("--chunksize", type=int, default=None, help="Stream each workbook in chunks of this many rows")
+    build.set_defaults(func=run_mock_build)
+    mock_summary = mock.add_parser("summary", help="Print the mock statement summary")
+    mock_summary.add_argument("--session", action="store_true", help="Interactive session: load once, query repeatedly")
+    mock_summary.set_defaults(func=run_mock_summary)
+    charts = mock.add_parser("charts", help="Render price trend charts to PNG files")
+    charts.add_argument("output_dir", nargs="?", default="charts")
+    charts.add_argument("--search", default=None, help="Only items whose name contains this")
+    charts.add_argument("--workers", type=int, default=None)
+    charts.set_defaults(func=run_mock_charts)
+
+    dedupe = commands.add_parser("dedupe", help="Find and merge near-duplicate item names (see item_dedupe.py)",
+                                 add_help=False)
+    dedupe.set_defaults(func=run_dedupe, passthrough=True)
+
+    bench = commands.add_parser("bench", help="Run the offline benchmark suite (see benchmark_suite.py)",
+                                add_help=False)
+    bench.set_defaults(func=run_bench, passthrough=True)
+
+    pages = commands.add_parser("pages", help="Raw page cache: replay extraction offline, or stats (see page_cache.py)",
+                                add_help=False)
+    pages.set_defaults(func=run_pages, passthrough=True)
+
+    history = commands.add_parser("history", help="Scraped history steps").add_subparsers(
+        dest="step", metavar="step", required=True)
+    export = history.add_parser("export", help="Export a history store to Excel")
+    export.add_argument("store", help="History store (.sqlite/.db, .xlsx or Parquet directory)")
+    export.add_argument("output", help="Excel file to write")
+    export.set_defaults(func=run_history_export)
+    compact = history.add_parser("compact", help="Convert a history store to change-only form")
+    compact.add_argument("store", help="History store to read")
+    compact.add_argument("output", help="Change-only .sqlite store to write")
+    compact.set_defaults(func=run_history_compact)
+    expand = history.add_parser("expand", help="Export history as a dense series (one row per product per period)")
+    expand.add_argument("store")
+    expand.add_argument("output", help="Excel file to write")
+    expand.add_argument("--freq", default="D", help="Fixed period, e.g. D or 12h")
+    expand.set_defaults(func=run_history_expand)
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args, extra = parser.parse_known_args(argv)
+    # dedupe, bench and pages hand their arguments on to the tool's own parser
+    if getattr(args, "passthrough", False):
+        args.passthrough = extra
+    elif extra:
+        parser.error(f"unrecognized arguments: {' '.join(extra)}")
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+# pack_units.py
+
+import numpy as np
+import pandas as pd
+
+# Unit spelling -> (base unit, base units per unit)
+UNIT_FACTORS = {
+    "MG": ("g", 0.001), "G": ("g", 1.0), "GR": ("g", 1.0), "GRM": ("g", 1.0), "KG": ("g", 1000.0),
+    "ML": ("ml", 1.0), "CL": ("ml", 10.0), "L": ("ml", 1000.0), "LT": ("ml", 1000.0),
+    "LTR": ("ml", 1000.0), "LITRE": ("ml", 1000.0),
+    "EA": ("each", 1.0), "EACH": ("each", 1.0), "PK": ("each", 1.0), "PACK": ("each", 1.0),
+    "PCS": ("each", 1.0), "SHEETS": ("each", 1.0), "ROLLS": ("each", 1.0),
+}
+BASE_UNITS = ["g", "ml", "each"]
+UNIT_BASE = {unit: base for unit, (base, _) in UNIT_FACTORS.items()}
+UNIT_SCALE = {unit: scale for unit, (_, scale) in UNIT_FACTORS.items()}
+
+# Optional "6 X" multipack count, then amount and unit: "500G", "1 KG", "6 X 330ML", "4PK"
+QUANTITY_PATTERN = r"^\s*(?:(?P<count>\d+)\s*[X×]\s*)?(?P<amount>\d[\d,]*(?:\.\d+)?)\s*(?P<unit>[A-Z]+)"
+# A bare multiplier with no size, as in older history: "6 X" is 6 each
+MULTIPACK_PATTERN = r"^\s*(\d+)\s*[X×]\s*$"
+# Columns added by normalise_history (derived, never stored)
+NORMALISED_COLUMNS = ["pack_quantity", "pack_unit", "price_per_base_unit"]
+
+
+def parse_quantities(text):
+    """
+    Parses quantity strings in one vectorized pass over the distinct values
+    (history repeats the same few pack sizes), then expands to every row.
+    Returns a DataFrame (same index) with `quantity` in base units (float,
+    multipacks multiplied out) and `base_unit` (g, ml or each); both NA
+    when the text has no recognised unit. A bare "6 X" counts as 6 each.
+    """
+    codes, uniques = pd.factorize(text.astype("string"))
+    upper = pd.Series(uniques, dtype="string").str.upper()
+    parts = upper.str.extract(QUANTITY_PATTERN)
+    amount = pd.to_numeric(parts["amount"].str.replace(",", "", regex=False), errors="coerce")
+    count = pd.to_numeric(parts["count"], errors="coerce").fillna(1)
+
+    multipack = pd.to_numeric(upper.str.extract(MULTIPACK_PATTERN)[0], errors="coerce")
+    bare = multipack.notna().to_numpy()
+    amount = amount.where(~bare, multipack)
+    unit = parts["unit"].astype(object).where(~bare, "EACH")
+    quantity = (amount * count * pd.to_numeric(unit.map(UNIT_SCALE), errors="coerce")).to_numpy(dtype=float)
+    base_unit = pd.Categorical(unit.map(UNIT_BASE), categories=BASE_UNITS)
+
+    # factorize gives -1 for missing text, which picks the trailing NaN
+    return pd.DataFrame({
+        "quantity": np.append(quantity, np.nan)[codes],
+        "base_unit": base_unit.take(codes, allow_fill=True),
+    }, index=text.index)
+
+
+def normalise_history(history):
+    """
+    Adds comparable size and price columns to scraped history:
+    - pack_quantity / pack_unit: pack_weight in base units (g, ml, each)
+    - price_per_base_unit: overall_price / pack_quantity, or when that is
+      missing the site's price_per_unit divided by its reference quantity
+      (`unit`, e.g. "1 KG" -> 1000 g) in the same base unit.
+    Multiply price_per_base_unit by 1000 for prices per kg or per litre.
+    """
+    raw = history.reindex(columns=["pack_weight", "unit", "overall_price", "price_per_unit"])
+    pack = parse_quantities(raw["pack_weight"])
+    reference = parse_quantities(raw["unit"])
+    overall = pd.to_numeric(raw["overall_price"], errors="coerce")
+    per_unit = pd.to_numeric(raw["price_per_unit"], errors="coerce")
+
+    from_pack = overall / pack["quantity"].where(pack["quantity"] > 0)
+    from_unit = per_unit / reference["quantity"].where(reference["quantity"] > 0)
+    same_unit = reference["base_unit"].astype(object) == pack["base_unit"].astype(object)
+    # No usable pack size: fall back to the site's own unit price and unit
+    no_pack = pack["base_unit"].isna()
+
+    out = history.copy()
+    out["pack_quantity"] = pack["quantity"]
+    out["pack_unit"] = pack["base_unit"].where(~no_pack, reference["base_unit"])
+    out["price_per_base_unit"] = from_pack.where(
+        from_pack.notna(), from_unit.where(same_unit | no_pack)
+    )
+    return out
@@ -0,0 +1,196 @@
+# page_cache.py
+#
+# On-disk cache of raw product pages. Every fetch is indexed in SQLite by
+# (url, fetched_at), with its status, ETag and Last-Modified. The page
+# itself is stored once as a gzip blob named by the SHA-256 of its content,
+# so an unchanged page costs no extra space. The scraper sends the
+# cached validators as If-None-Match / If-Modified-Since, and a 304 reply
+# is served from the cache.
+#
+# Replay re-runs extraction (Scraper.parse_product_page) over the cached
+# pages in a process pool, with no network, after extraction rules change:
+#   python page_cache.py replay [--latest] [--workers N] [--out replayed.xlsx]
+#   python page_cache.py stats
+
+import os
+import gzip
+import time
+import uuid
+import sqlite3
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+from history_store import export_excel
+
+CACHE_DIR = "page_cache"
+INDEX_FILE = "index.sqlite"
+REPLAY_FILE = "replayed_products.xlsx"
+REPLAY_BATCH_SIZE = 200  # Pages per worker task
+
+
+class CacheMiss(LookupError):
+    """A 304 reply for a page whose cached copy is missing or unreadable."""
+
+
+def decode(content, encoding):
+    return content.decode(encoding or "utf-8", errors="replace")
+
+
+class PageCache:
+    """Content-addressed gzip blobs under <root>/blobs plus a SQLite fetch index."""
+
+    def __init__(self, root=CACHE_DIR):
+        self.root = root
+        self.blob_dir = os.path.join(root, "blobs")
+        os.makedirs(self.blob_dir, exist_ok=True)
+        self.index_path = os.path.join(root, INDEX_FILE)
+        with self._connect() as con:
+            con.execute(
+                "CREATE TABLE IF NOT EXISTS fetches ("
+                "url TEXT NOT NULL, fetched_at TEXT NOT NULL, status INTEGER, sha256 TEXT NOT NULL, "
+                "bytes INTEGER, encoding TEXT, etag TEXT, last_modified TEXT, "
+                "PRIMARY KEY (url, fetched_at))"
+            )
+
+    def _connect(self):
+        return sqlite3.connect(self.index_path, timeout=30)
+
+    def __len__(self):
+        with self._connect() as con:
+            return con.execute("SELECT COUNT(*) FROM fetches").fetchone()[0]
+
+    # --- Blobs ---
+    def blob_path(self, sha256):
+        return os.path.join(self.blob_dir, sha256[:2], f"{sha256}.html.gz")
+
+    def read(self, sha256):
+        """Raw page bytes for a content hash."""
+        with gzip.open(self.blob_path(sha256), "rb") as f:
+            return f.read()
+
+    def _write_blob(self, content):
+        sha256 = hashlib.sha256(content).hexdigest()
+        path = self.blob_path(sha256)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{uuid.uuid4().hex}.tmp"  # Concurrent writers never see a partial blob
+            with open(tmp, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb", mtime=0) as f:
+                f.write(content)
+            os.replace(tmp, path)
+        return sha256
+
+    # --- Index ---
+    def latest(self, url):
+        """The most recent fetch of url as a dict (None if never cached)."""
+        with self._connect() as con:
+            con.row_factory = sqlite3.Row
+            row = con.execute(
+                "SELECT * FROM fetches WHERE url = ? ORDER BY fetched_at DESC LIMIT 1", (url,)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def conditional_headers(self, url):
+        """If-None-Match / If-Modified-Since for the latest cached copy of url."""
+        latest = self.latest(url)
+        headers = {}
+        if latest and latest["etag"]:
+            headers["If-None-Match"] = latest["etag"]
+        if latest and latest["last_modified"]:
+            headers["If-Modified-Since"] = latest["last_modified"]
+        return headers
+
+    def store(self, url, response, fetched_at):
+        """
+        Records a fetch. A 200 stores the body; a 304 points the new entry at
+        the latest cached body. Returns the page text. Raises CacheMiss for
+        a 304 that can't be served from the cache (re-fetch unconditionally).
+        """
+        if response.status_code == 304:
+            latest = self.latest(url)
+            if latest is None:
+                raise CacheMiss(f"304 for {url} but no cached copy")
+            sha256, encoding = latest["sha256"], latest["encoding"]
+            etag = response.headers.get("ETag") or latest["etag"]
+            last_modified = response.headers.get("Last-Modified") or latest["last_modified"]
+            try:
+                content = self.read(sha256)
+            except (OSError, EOFError) as e:
+                raise CacheMiss(f"304 for {url} but the cached copy is unreadable: {e}") from e
+        else:
+            content = response.content
+            sha256, encoding = self._write_blob(content), response.encoding
+            etag, last_modified = response.headers.get("ETag"), response.headers.get("Last-Modified")
+        with self._connect() as con:
+            con.execute(
+                "INSERT OR REPLACE INTO fetches VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, fetched_at, response.status_code, sha256, len(content), encoding, etag, last_modified),
+            )
+        return decode(content, encoding)
+
+    def fetches(self, latest_only=False):
+        """The fetch index as a DataFrame, optionally only each URL's latest fetch."""
+        query = "SELECT * FROM fetches"
+        if latest_only:
+            query += " WHERE (url, fetched_at) IN (SELECT url, MAX(fetched_at) FROM fetches GROUP BY url)"
+        with self._connect() as con:
+            return pd.read_sql_query(query + " ORDER BY url, fetched_at", con)
+
+
+# ----------------------------------------
+# Offline replay
+# ----------------------------------------
+def _replay_batch(root, rows):
+    """Worker: re-extracts (url, fetched_at, sha256, encoding) rows from cached blobs."""
+    from Scraper import parse_product_page
+
+    cache = PageCache(root)
+    results = []
+    for url, fetched_at, sha256, encoding in rows:
+        html = decode(cache.read(sha256), encoding)
+        results.append({"url": url, **parse_product_page(html), "scraped_at": fetched_at})
+    return results
+
+
+def replay(root=CACHE_DIR, latest_only=False, workers=None):
+    """Re-runs extraction over cached pages in parallel, without the network. Returns history-shaped rows."""
+    index = PageCache(root).fetches(latest_only)
+    rows = list(index[["url", "fetched_at", "sha256", "encoding"]].itertuples(index=False, name=None))
+    batches = [rows[i:i + REPLAY_BATCH_SIZE] for i in range(0, len(rows), REPLAY_BATCH_SIZE)]
+    if len(batches) <= 1 or workers == 1:
+        results = [_replay_batch(root, batch) for batch in batches]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_replay_batch, [root] * len(batches), batches))
+    return pd.DataFrame([row for batch in results for row in batch])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Raw product page cache.")
+    parser.add_argument("command", choices=["replay", "stats"])
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    parser.add_argument("--latest", action="store_true", help="Replay only each URL's latest fetch")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--out", default=REPLAY_FILE, help="Where to write the replayed rows")
+    args = parser.parse_args(argv)
+
+    if args.command == "stats":
+        cache = PageCache(args.cache_dir)
+        index = cache.fetches()
+        stored = index.drop_duplicates("sha256")
+        on_disk = sum(os.path.getsize(cache.blob_path(sha)) for sha in stored["sha256"])
+        print(f"🗄️ {len(index)} fetches of {index['url'].nunique()} URLs; "
+              f"{len(stored)} distinct pages, {on_disk / 1e6:.1f} MB on disk "
+              f"({index['bytes'].sum() / 1e6:.1f} MB raw); {(index['status'] == 304).sum()} not-modified replies")
+        return
+
+    start = time.perf_counter()
+    replayed = replay(args.cache_dir, args.latest, args.workers)
+    elapsed = time.perf_counter() - start
+    print(f"🔁 Re-extracted {len(replayed)} cached pages in {elapsed:.1f}s")
+    if not replayed.empty:
+        export_excel(replayed, args.out)
+
+
+if __name__ == "__main__":
+    main()
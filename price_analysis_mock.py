@@ -1,34 +1,58 @@
+import os
+import re
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
-import matplotlib.pyplot as plt
+from utils import has_display
 
 
 # ----------------------------------------
 # Monthly weighted average unit prices
 # ----------------------------------------
-def calculate_weighted_averages(df):
-    """Computes weighted average unit prices for bought and sold items by month."""
-    bought = df[df['state'] == 'BOUGHT']
-    sold = df[df['state'] == 'SOLD']
-
-    bought_monthly = (
-        bought
-        .groupby([bought['name_clean'], bought['date'].dt.to_period('M')])
-        .apply(lambda x: (x['price'] * x['quantity']).sum() / x['quantity'].sum())
-        .reset_index(name='weighted_avg_bought_price')
+def _price_trends(sums):
+    """Pivots line_value/quantity sums indexed by (name_clean, month period, state) into price_trends."""
+    price_trends = (
+        (sums['line_value'] / sums['quantity'])
+        .unstack('state')
+        .rename(columns=str)
+        .reindex(columns=['BOUGHT', 'SOLD'])
+        .rename(columns={'BOUGHT': 'weighted_avg_bought_price', 'SOLD': 'weighted_avg_sold_price'})
+        .rename_axis(columns=None)
+        .reset_index()
     )
+    price_trends['month'] = price_trends['month'].dt.to_timestamp()
+
+    return price_trends
+
 
-    sold_monthly = (
-        sold
-        .groupby([sold['name_clean'], sold['date'].dt.to_period('M')])
-        .apply(lambda x: (x['price'] * x['quantity']).sum() / x['quantity'].sum())
-        .reset_index(name='weighted_avg_sold_price')
+def calculate_weighted_averages(df):
+    """
+    Computes weighted average unit prices for bought and sold items by month.
+    One grouped sum of price*quantity and quantity over (item, month, state),
+    pivoted to a bought and a sold column; no Python call per group.
+    """
+    traded = df[df['state'].isin(['BOUGHT', 'SOLD'])]
+    sums = (
+        traded
+        .assign(line_value=traded['price'] * traded['quantity'])
+        .groupby([traded['name_clean'], traded['date'].dt.to_period('M').rename('month'), traded['state']],
+                 observed=True)
+        [['line_value', 'quantity']]
+        .sum()
     )
+    return _price_trends(sums)
 
-    price_trends = pd.merge(bought_monthly, sold_monthly, on=['name_clean', 'date'], how='outer')
-    price_trends.rename(columns={'date': 'month'}, inplace=True)
-    price_trends['month'] = price_trends['month'].dt.to_timestamp()
 
-    return price_trends
+def weighted_averages_from_rollup(cube):
+    """calculate_weighted_averages computed from a monthly rollup (see rollup_store) instead of raw lines."""
+    traded = cube[cube['state'].isin(['BOUGHT', 'SOLD'])]
+    sums = (
+        traded
+        .groupby([traded['name_clean'], traded['month'].dt.to_period('M'), traded['state']], observed=True)
+        [['line_value', 'quantity']]
+        .sum()
+    )
+    return _price_trends(sums)
 
 # ----------------------------------------
 # Buy vs Sell summary
@@ -36,10 +60,16 @@ def calculate_weighted_averages(df):
 def buy_sell_summary(df):
     """
     Returns total buy value, total sell value, and net difference (£).
-    Uses precomputed 'total_value' column from the cleaned data.
+    Uses precomputed 'total_value' column from the cleaned data
+    (a monthly rollup frame works too).
     """
     total_buy = df.loc[df['state'] == 'BOUGHT', 'total_value'].sum()
     total_sell = df.loc[df['state'] == 'SOLD', 'total_value'].sum()
+    return format_buy_sell(total_buy, total_sell)
+
+
+def format_buy_sell(total_buy, total_sell):
+    """The buy_sell_summary dict for precomputed totals."""
     difference = total_sell - total_buy
 
     return {
@@ -48,33 +78,136 @@ def buy_sell_summary(df):
         "Difference (£)": f"£{difference:,.2f}"
     }
 
+# ----------------------------------------
+# Item search index
+# ----------------------------------------
+class ItemSearchIndex:
+    """
+    Case-insensitive substring search over price_trends item names.
+    Built once: a trigram -> item ids index plus each item's rows already
+    sorted by month, so a search only checks the items sharing all of the
+    term's trigrams instead of scanning every row.
+    """
+
+    def __init__(self, price_trends):
+        self.trends = {
+            item: rows.reset_index(drop=True)
+            for item, rows in price_trends.sort_values('month', kind='stable').groupby('name_clean', sort=True, observed=True)
+        }
+        self.items = list(self.trends)
+        self.lowered = [str(item).lower() for item in self.items]
+        self.trigrams = {}
+        for i, name in enumerate(self.lowered):
+            for gram in {name[j:j + 3] for j in range(len(name) - 2)}:
+                self.trigrams.setdefault(gram, []).append(i)
+
+    def __len__(self):
+        return len(self.items)
+
+    def search(self, term):
+        """Items whose name contains term (plain text, not a regex), in name order."""
+        term = term.lower()
+        if len(term) < 3:
+            candidates = range(len(self.items))  # Too short for trigrams: check every name once
+        else:
+            postings = sorted(
+                (self.trigrams.get(term[j:j + 3], []) for j in range(len(term) - 2)), key=len
+            )
+            candidates = set(postings[0]).intersection(*postings[1:])
+        return [self.items[i] for i in sorted(candidates) if term in self.lowered[i]]
+
+
 # ----------------------------------------
 # Plot price trends for a specific item
 # ----------------------------------------
-def plot_item_prices(price_trends, search_term):
-    """Displays a line plot of price trends for items matching the search term."""
-    matches = price_trends[price_trends['name_clean'].str.lower().str.contains(search_term.lower())]
+def draw_item_prices(ax, item, df_item):
+    """Draws one item's monthly bought/sold price lines on a Matplotlib Axes."""
+    ax.plot(df_item['month'], df_item['weighted_avg_bought_price'], marker='o', label='Weighted Avg Bought Price')
+    ax.plot(df_item['month'], df_item['weighted_avg_sold_price'], marker='o', label='Weighted Avg Sold Price')
+
+    ax.set_title(f'Monthly Weighted Avg Prices for {item}')
+    ax.set_ylabel('Price (£)')
+    ax.set_xlabel('Month')
+    ax.legend()
+    ax.grid(True)
+
 
-    if matches.empty:
+def plot_item_prices(price_trends, search_term, index=None):
+    """
+    Displays a line plot of price trends for items matching the search term.
+    Pass an ItemSearchIndex built once to make repeated searches instant.
+    Without a display the charts are saved as PNGs instead.
+    """
+    if index is None:
+        index = ItemSearchIndex(price_trends)
+    matches = index.search(search_term)
+
+    if not matches:
         print(f"No items found matching: {search_term}")
         return
 
-    for item in matches['name_clean'].unique():
-        df_item = matches[matches['name_clean'] == item].sort_values('month')
-
-        plt.figure(figsize=(10, 5))
-        plt.plot(df_item['month'], df_item['weighted_avg_bought_price'], marker='o', label='Weighted Avg Bought Price')
-        plt.plot(df_item['month'], df_item['weighted_avg_sold_price'], marker='o', label='Weighted Avg Sold Price')
+    if not has_display():
+        paths = render_item_charts(price_trends, items=matches, index=index, workers=1)
+        print(f"🖼️ No display: saved {len(paths)} chart(s) to {os.path.dirname(paths[0])}")
+        return
 
-        plt.title(f'Monthly Weighted Avg Prices for {item}')
-        plt.ylabel('Price (£)')
-        plt.xlabel('Month')
-        plt.legend()
-        plt.grid(True)
-        plt.tight_layout()
+    import matplotlib.pyplot as plt  # Deferred: only interactive plotting needs pyplot
+    for item in matches:
+        fig, ax = plt.subplots(figsize=(10, 5))
+        draw_item_prices(ax, item, index.trends[item])
+        fig.tight_layout()
         plt.show()
 
 
+# ----------------------------------------
+# Batch chart rendering (headless)
+# ----------------------------------------
+CHART_BATCH_SIZE = 50  # Items per worker task
+
+
+def chart_filename(item):
+    """File-safe PNG name for an item; a short hash keeps similar names apart."""
+    slug = re.sub(r'[^a-z0-9]+', '_', str(item).lower()).strip('_')[:60] or 'item'
+    digest = hashlib.blake2b(str(item).encode('utf-8'), digest_size=4).hexdigest()
+    return f"{slug}_{digest}.png"
+
+
+def _render_batch(batch, output_dir, dpi):
+    """Worker: renders (item, rows) pairs to PNGs with the Agg canvas (no GUI, no pyplot state)."""
+    from matplotlib.figure import Figure
+
+    paths = []
+    for item, df_item in batch:
+        fig = Figure(figsize=(10, 5))
+        draw_item_prices(fig.add_subplot(), item, df_item)
+        fig.tight_layout()
+        path = os.path.join(output_dir, chart_filename(item))
+        fig.savefig(path, dpi=dpi, format='png')
+        paths.append(path)
+    return paths
+
+
+def render_item_charts(price_trends, output_dir="charts", items=None, index=None, workers=None, dpi=100):
+    """
+    Renders one trend chart per item to PNG files in output_dir, spreading
+    batches of items across a process pool. items defaults to every item.
+    Returns the written paths.
+    """
+    if index is None:
+        index = ItemSearchIndex(price_trends)
+    items = index.items if items is None else [item for item in items if item in index.trends]
+    os.makedirs(output_dir, exist_ok=True)
+
+    pairs = [(item, index.trends[item]) for item in items]
+    batches = [pairs[i:i + CHART_BATCH_SIZE] for i in range(0, len(pairs), CHART_BATCH_SIZE)]
+    if len(batches) <= 1 or workers == 1:
+        return [path for batch in batches for path in _render_batch(batch, output_dir, dpi)]
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(_render_batch, batches, [output_dir] * len(batches), [dpi] * len(batches))
+        return [path for paths in results for path in paths]
+
+
 # ----------------------------------------
 # Top N most frequently traded items
 # ----------------------------------------
@@ -88,7 +221,7 @@ def get_top_items_with_quantity_and_value(df: pd.DataFrame, n: int = 10) -> pd.D
     df['total_line_value'] = df['price'] * df['quantity']
 
     top = (
-        df.groupby('name_clean')
+        df.groupby('name_clean', observed=True)
         .agg(
             trade_count=('name_clean', 'count'),
             total_quantity=('quantity', 'sum'),
@@ -103,6 +236,24 @@ def get_top_items_with_quantity_and_value(df: pd.DataFrame, n: int = 10) -> pd.D
     return top
 
 
+def top_items_from_rollup(cube: pd.DataFrame, n: int = 10) -> pd.DataFrame:
+    """get_top_items_with_quantity_and_value computed from a monthly rollup."""
+    top = (
+        cube.groupby('name_clean', observed=True)
+        .agg(
+            trade_count=('line_count', 'sum'),
+            total_quantity=('quantity', 'sum'),
+            total_value=('line_value', 'sum')
+        )
+        .sort_values('trade_count', ascending=False, kind='stable')
+        .head(n)
+    )
+
+    # Format currency
+    top['total_value'] = top['total_value'].apply(lambda x: f"£{x:,.2f}")
+    return top
+
+
 # ----------------------------------------
 # Top N items by total revenue from sales
 # ----------------------------------------
@@ -114,7 +265,7 @@ def get_top_selling_items(df, n=20):
     sold_df['total_sale'] = sold_df['price'] * sold_df['quantity']
 
     return (
-        sold_df.groupby('name_clean')['total_sale']
+        sold_df.groupby('name_clean', observed=True)['total_sale']
         .sum()
         .sort_values(ascending=False)
         .head(n)
@@ -123,6 +274,21 @@ def get_top_selling_items(df, n=20):
     )
 
 
+def top_selling_from_rollup(cube, n=20):
+    """get_top_selling_items computed from a monthly rollup."""
+    sold = cube[cube['state'] == 'SOLD']
+
+    return (
+        sold.groupby('name_clean', observed=True)['line_value']
+        .sum()
+        .rename('total_sale')
+        .sort_values(ascending=False, kind='stable')
+        .head(n)
+        .apply(lambda x: f"£{x:,.2f}")
+        .to_string()
+    )
+
+
 # ----------------------------------------
 # Total number of unique items traded
 # ----------------------------------------
@@ -0,0 +1,46 @@
+# product_codes.py
+
+import hashlib
+from functools import lru_cache
+
+AUTO_CODE_START = 90000000  # Base for autogenerated codes
+CODE_SPACE = 10000000       # Autogenerated codes fall in [AUTO_CODE_START, AUTO_CODE_START + CODE_SPACE)
+CODE_DIGEST_KEY = b"nutritrack-product-code-v1"  # Changing this changes every generated code
+
+
+def receipt_key(store, item_clean):
+    """Key for a receipt item; the separator keeps ("ab", "c") and ("a", "bc") apart."""
+    return f"{store}\x1f{item_clean}"
+
+
+@lru_cache(maxsize=None)
+def stable_code(key, attempt=0):
+    """
+    Deterministic code for `key`, identical in every process and run
+    (unlike hash(), which is salted per process). attempt > 0 gives the
+    next candidate when an earlier one collided.
+    """
+    data = key if attempt == 0 else f"{key}\x00{attempt}"
+    digest = hashlib.blake2b(data.encode("utf-8"), digest_size=8, key=CODE_DIGEST_KEY).digest()
+    return AUTO_CODE_START + int.from_bytes(digest, "big") % CODE_SPACE
+
+
+def assign_codes(keys, taken=None):
+    """
+    Returns {key: code} for `keys`, resolving collisions.
+    - taken: {code: key} already in use (e.g. from the lookup); a key that
+      already owns its code keeps it.
+    - Keys are resolved in sorted order, so any process given the same keys
+      and taken codes produces the same assignment.
+    """
+    owners = dict(taken or {})
+    assigned = {}
+    for key in sorted(set(keys)):
+        attempt = 0
+        code = stable_code(key)
+        while owners.get(code, key) != key:
+            attempt += 1
+            code = stable_code(key, attempt)
+        owners[code] = key
+        assigned[key] = code
+    return assigned
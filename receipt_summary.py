@@ -1,39 +1,57 @@
+import os
+import sys
 import pandas as pd
+from cached_io import read_excel_cached
+from rollup_store import RollupStore, aggregate_receipts
+from schema import compact_frame, report_memory
 
 CLEANED_FILE = "Receipts_cleaned.xlsx"
+ROLLUP_DB = "receipt_rollup.sqlite"  # Kept up to date by update_receipt_lookup.py
 
-def main():
+def main(include_cleaned=True):
+    """
+    Summarizes receipts from the monthly rollup, so the cost depends on
+    items x months rather than the number of receipt lines. The rollup is
+    rebuilt from the cleaned file only if it no longer matches it.
+    The cleaned rows are also copied into Receipt_Summary.xlsx, which needs
+    a full read of the cleaned file; include_cleaned=False (or --no-cleaned)
+    skips that sheet for a faster summary.
+    """
     print("=== RECEIPT SUMMARY ===")
 
-    # Step 1: Load cleaned receipts
-    try:
-        df = pd.read_excel(CLEANED_FILE)
-    except FileNotFoundError:
+    # Step 1: Load the monthly rollup
+    if not os.path.exists(CLEANED_FILE):
         raise SystemExit(f"❌ {CLEANED_FILE} not found. Run update_receipt_lookup.py first.")
+    with RollupStore(ROLLUP_DB) as rollup:
+        if rollup.sync(CLEANED_FILE, lambda: aggregate_receipts(read_excel_cached(CLEANED_FILE))):
+            print(f"📊 Rollup rebuilt from {CLEANED_FILE}")
+        cube = compact_frame(rollup.frame())
+    report_memory(cube, "Receipt rollup")
 
     # Step 2: Basic stats
-    total_rows = len(df)
-    unique_items = df['item_clean'].nunique()
-    total_spend = df['total_value'].sum()
+    total_rows = int(cube['line_count'].sum())
+    unique_items = cube['item'].nunique()
+    total_spend = cube['total_value'].sum()
 
     # Step 3: Top items
     most_frequent = (
-        df.groupby('item_clean')
-          .agg(
-              count=('item_clean', 'size'),
-              total_quantity=('quantity', 'sum'),
-              total_spend=('total_value', 'sum')
-          )
-          .sort_values('count', ascending=False)
-          .head(10)
+        cube.groupby('item', observed=True)
+            .agg(
+                count=('line_count', 'sum'),
+                total_quantity=('quantity', 'sum'),
+                total_spend=('total_value', 'sum')
+            )
+            .rename_axis('item_clean')
+            .sort_values('count', ascending=False, kind='stable')
+            .head(10)
     )
 
     # Step 4: Spending over time
     spend_by_month = (
-        df.groupby(df['date'].dt.to_period('M'))['total_value']
-          .sum()
-          .reset_index()
-          .rename(columns={'date': 'month', 'total_value': 'monthly_spend'})
+        cube.groupby(cube['month'].dt.to_period('M'), observed=True)['total_value']
+            .sum()
+            .reset_index()
+            .rename(columns={'total_value': 'monthly_spend'})
     )
 
     # Step 5: Print summary
@@ -47,7 +65,8 @@ def main():
 
     # (Optional) Save summaries
     with pd.ExcelWriter("Receipt_Summary.xlsx") as writer:
-        df.to_excel(writer, sheet_name="Cleaned Receipts", index=False)
+        if include_cleaned:
+            read_excel_cached(CLEANED_FILE).to_excel(writer, sheet_name="Cleaned Receipts", index=False)
         most_frequent.to_excel(writer, sheet_name="Top Items")
         spend_by_month.to_excel(writer, sheet_name="Monthly Spend", index=False)
 
@@ -55,4 +74,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    main(include_cleaned="--no-cleaned" not in sys.argv)
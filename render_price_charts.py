@@ -0,0 +1,34 @@
+# render_price_charts.py
+#
+# Renders monthly price-trend charts for mock items to PNG files without a
+# display (Agg canvas), spread across a process pool. Meant for nightly
+# chart packs.
+#
+# Usage: python render_price_charts.py [output_dir] [search_term]
+# Without a search term, every item gets a chart.
+
+import sys
+import time
+from mock_summary import load_mock_rollup
+from price_analysis_mock import ItemSearchIndex, weighted_averages_from_rollup, render_item_charts
+
+OUTPUT_DIR = "charts"
+
+
+def main(output_dir=OUTPUT_DIR, search_term=None, workers=None):
+    print("=== RENDER PRICE TREND CHARTS ===")
+    price_trends = weighted_averages_from_rollup(load_mock_rollup())
+    index = ItemSearchIndex(price_trends)
+    items = index.search(search_term) if search_term else index.items
+    if not items:
+        raise SystemExit(f"❌ No items found matching: {search_term}")
+
+    start = time.perf_counter()
+    paths = render_item_charts(price_trends, output_dir, items=items, index=index, workers=workers)
+    elapsed = time.perf_counter() - start
+    print(f"🖼️ Rendered {len(paths)} charts to {output_dir} in {elapsed:.1f}s ({len(paths) / elapsed:.1f} charts/s)")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    main(args[0] if args else OUTPUT_DIR, args[1] if len(args) > 1 else None)
@@ -0,0 +1,194 @@
+# rollup_store.py
+
+import os
+import json
+import sqlite3
+import pandas as pd
+
+ROLLUP_KEYS = ["item", "store", "month", "state"]
+ROLLUP_MEASURES = ["line_count", "quantity", "total_value", "line_value"]
+NO_STORE = ""  # Mock statements have no store
+NO_STATE = ""  # Receipts are all purchases and carry no state
+
+
+# ----------------------------------------
+# Cleaned rows -> rollup rows
+# ----------------------------------------
+def aggregate(df, item_col, store_col=None, state_col=None):
+    """
+    Sums cleaned rows per (item, store, month, state):
+    line_count, quantity, total_value and line_value (price * quantity).
+    Rows need date, price, quantity and total_value columns.
+    """
+    def _key(col, default):
+        if col is None:
+            return pd.Series(default, index=df.index)
+        return df[col].astype(object).fillna(default).astype(str)
+
+    rows = pd.DataFrame({
+        "item": _key(item_col, ""),
+        "store": _key(store_col, NO_STORE),
+        "month": pd.to_datetime(df["date"]).dt.strftime("%Y-%m").fillna(""),
+        "state": _key(state_col, NO_STATE),
+        "line_count": 1,
+        "quantity": pd.to_numeric(df["quantity"], errors="coerce"),
+        "total_value": pd.to_numeric(df["total_value"], errors="coerce"),
+        "line_value": pd.to_numeric(df["price"], errors="coerce") * pd.to_numeric(df["quantity"], errors="coerce"),
+    }, index=df.index)
+    return rows.groupby(ROLLUP_KEYS, sort=False, observed=True)[ROLLUP_MEASURES].sum().reset_index()
+
+
+def aggregate_receipts(df):
+    """Rollup rows for cleaned receipts (update_receipt_lookup output)."""
+    return aggregate(df, "item_clean", store_col="store")
+
+
+def aggregate_mock(df):
+    """Rollup rows for cleaned mock statements (build_mock_data output)."""
+    return aggregate(df, "name_clean", state_col="state")
+
+
+# ----------------------------------------
+# Materialized cube
+# ----------------------------------------
+class RollupStore:
+    """
+    Monthly rollup cube in an SQLite file: one row per (item, store, month,
+    state) with line_count, quantity, total_value and line_value sums.
+    Kept up to date with add()/subtract() as cleaned rows arrive or go away,
+    so summaries scale with items x months instead of transactions.
+    Records which cleaned file (path, mtime, size) it currently reflects,
+    and optionally the fingerprints of every raw row that went into that
+    file, including rows cleaning dropped.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.con = sqlite3.connect(path)
+        self.con.executescript("""
+            CREATE TABLE IF NOT EXISTS rollup (
+                item TEXT NOT NULL,
+                store TEXT NOT NULL,
+                month TEXT NOT NULL,
+                state TEXT NOT NULL,
+                line_count INTEGER NOT NULL,
+                quantity REAL NOT NULL,
+                total_value REAL NOT NULL,
+                line_value REAL NOT NULL,
+                PRIMARY KEY (item, store, month, state)
+            );
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS processed (
+                fingerprint TEXT PRIMARY KEY
+            ) WITHOUT ROWID;
+        """)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.con.close()
+
+    def __len__(self):
+        return self.con.execute("SELECT COUNT(*) FROM rollup").fetchone()[0]
+
+    # ----------------------------------------
+    # Updates
+    # ----------------------------------------
+    def _apply(self, rows, sign):
+        values = [
+            (item, store, month, state, sign * int(n), sign * float(q), sign * float(v), sign * float(lv))
+            for item, store, month, state, n, q, v, lv in rows[ROLLUP_KEYS + ROLLUP_MEASURES].itertuples(index=False)
+        ]
+        self.con.executemany(
+            "INSERT INTO rollup VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (item, store, month, state) DO UPDATE SET "
+            "line_count = line_count + excluded.line_count, "
+            "quantity = quantity + excluded.quantity, "
+            "total_value = total_value + excluded.total_value, "
+            "line_value = line_value + excluded.line_value",
+            values,
+        )
+        self.con.execute("DELETE FROM rollup WHERE line_count <= 0")
+
+    def add(self, rows):
+        """Adds aggregated rows (from aggregate()) to the cube."""
+        with self.con:
+            self._apply(rows, 1)
+
+    def subtract(self, rows):
+        """Removes aggregated rows previously added; emptied cells are dropped."""
+        with self.con:
+            self._apply(rows, -1)
+
+    def rebuild(self, rows):
+        """Replaces the whole cube with the given aggregated rows."""
+        with self.con:
+            self.con.execute("DELETE FROM rollup")
+            self._apply(rows, 1)
+
+    # ----------------------------------------
+    # Source tracking
+    # ----------------------------------------
+    @staticmethod
+    def _signature(source_path):
+        stat = os.stat(source_path)
+        return json.dumps({"path": os.path.abspath(source_path), "mtime_ns": stat.st_mtime_ns, "size": stat.st_size})
+
+    def mark_current(self, source_path, fingerprints=None):
+        """
+        Records that the cube now matches source_path as written. fingerprints
+        are the raw rows source_path was built from (see processed_fingerprints);
+        without them any previously recorded set is cleared.
+        """
+        with self.con:
+            self.con.execute(
+                "INSERT OR REPLACE INTO meta VALUES ('source', ?)", (self._signature(source_path),)
+            )
+            self.con.execute("DELETE FROM processed")
+            self.con.execute("DELETE FROM meta WHERE key = 'processed'")
+            if fingerprints is not None:
+                self.con.executemany("INSERT OR IGNORE INTO processed VALUES (?)",
+                                     ((fp,) for fp in pd.Series(fingerprints).dropna().unique()))
+                self.con.execute("INSERT INTO meta VALUES ('processed', ?)", (str(len(fingerprints)),))
+
+    def processed_fingerprints(self, source_path):
+        """
+        Fingerprints of every raw row handled by the run that wrote source_path,
+        kept or dropped; None if none were recorded or the file has changed since.
+        """
+        recorded = self.con.execute("SELECT 1 FROM meta WHERE key = 'processed'").fetchone()
+        if recorded is None or not self.is_current(source_path):
+            return None
+        return pd.Index([fp for fp, in self.con.execute("SELECT fingerprint FROM processed")], dtype=object)
+
+    def is_current(self, source_path):
+        """True if the cube was last synced with source_path and the file hasn't changed since."""
+        row = self.con.execute("SELECT value FROM meta WHERE key = 'source'").fetchone()
+        return row is not None and os.path.exists(source_path) and row[0] == self._signature(source_path)
+
+    def sync(self, source_path, load_rows):
+        """
+        Rebuilds the cube from load_rows() (aggregated rows of source_path)
+        unless it already reflects the file. Returns True if it rebuilt.
+        """
+        if self.is_current(source_path):
+            return False
+        self.rebuild(load_rows())
+        self.mark_current(source_path)
+        return True
+
+    # ----------------------------------------
+    # Reads
+    # ----------------------------------------
+    def frame(self):
+        """The cube as a DataFrame; month is the first day of the month (NaT if undated)."""
+        cube = pd.read_sql_query("SELECT * FROM rollup ORDER BY item, store, month, state", self.con)
+        cube["month"] = pd.to_datetime(cube["month"].replace("", None), format="%Y-%m")
+        return cube
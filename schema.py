@@ -0,0 +1,72 @@
+# schema.py
+
+import numpy as np
+import pandas as pd
+
+# Repeated string keys: stored once per distinct value as categoricals
+CATEGORY_COLUMNS = ["store", "location", "item_clean", "name_clean", "state", "item"]
+# Whole-number counts: int32 when every value is a whole number in range, else left as is
+COUNT_COLUMNS = ["quantity", "line_count"]
+# Product codes: generated ones fit int32 (see product_codes.py), but codes
+# taken from the raw data can be EAN barcodes (13 digits), which need Int64
+CODE_COLUMNS = ["productCode"]
+
+
+def compact_dtypes(df):
+    """
+    The compact dtype for each known column of df: categoricals for repeated
+    string keys, int32 for whole-number counts, Int32 for product codes
+    (Int64 when any code is outside the int32 range).
+    Prices and values stay float64 so money sums don't lose precision.
+    """
+    dtypes = {}
+    for col in df.columns:
+        series = df[col]
+        if col in CATEGORY_COLUMNS and not isinstance(series.dtype, pd.CategoricalDtype):
+            dtypes[col] = "category"
+        elif col in COUNT_COLUMNS and pd.api.types.is_numeric_dtype(series) and series.notna().all():
+            info = np.iinfo(np.int32)
+            whole = (series % 1 == 0).all()
+            if whole and (series.empty or (series.min() >= info.min and series.max() <= info.max)):
+                dtypes[col] = "int32"
+        elif col in CODE_COLUMNS:
+            codes = pd.to_numeric(series, errors="coerce")
+            info = np.iinfo(np.int32)
+            in_range = codes.isna().all() or (codes.min() >= info.min and codes.max() <= info.max)
+            dtypes[col] = "Int32" if in_range else "Int64"
+    return dtypes
+
+
+def compact_frame(df):
+    """Returns df with compact_dtypes applied (a new frame; df is left untouched)."""
+    dtypes = compact_dtypes(df)
+    if "productCode" in dtypes:
+        df = df.assign(productCode=pd.to_numeric(df["productCode"], errors="coerce"))
+    return df.astype(dtypes) if dtypes else df
+
+
+def concat_compact(frames, columns=None, ignore_index=False):
+    """
+    Joins frames (e.g. cleaned chunks) into one compact frame. Each frame is
+    compacted as it arrives, so only compact pieces are held, and
+    categoricals are joined on the union of their categories rather than
+    falling back to object. No frames gives an empty frame with `columns`.
+    """
+    parts = [compact_frame(frame) for frame in frames]
+    if not parts:
+        return pd.DataFrame(columns=columns)
+    for col in parts[0].columns:
+        if len(parts) > 1 and isinstance(parts[0][col].dtype, pd.CategoricalDtype):
+            categories = pd.Index(np.concatenate([part[col].cat.categories for part in parts])).unique()
+            parts = [part.assign(**{col: part[col].cat.set_categories(categories)}) for part in parts]
+    return compact_frame(pd.concat(parts, ignore_index=ignore_index))
+
+
+def memory_mb(df):
+    """Deep memory usage of df in MB (object strings included)."""
+    return df.memory_usage(deep=True).sum() / 1e6
+
+
+def report_memory(df, stage):
+    """Prints the row count and memory footprint of df at a pipeline stage."""
+    print(f"🧠 {stage}: {len(df)} rows, {memory_mb(df):.1f} MB")
@@ -0,0 +1,278 @@
+# scrape_scheduler.py
+#
+# Staleness-driven scraping: instead of refetching every product that is
+# older than a fixed window, each product gets its own revisit interval
+# from how often its price has changed in the history, and a priority
+# queue hands out the products that are due first.
+#
+# Usage:
+#   python scrape_scheduler.py [--budget 200]             # one run: fetch up to 200 due products
+#   python scrape_scheduler.py --daemon [--budget 200]    # keep running, sleeping until the next is due
+#
+# Interval per product = CHANGES_PER_VISIT / change rate, clamped to
+# [MIN_INTERVAL_DAYS, MAX_INTERVAL_DAYS]. The change rate is
+# (price changes + PRIOR_CHANGES) / (days observed + PRIOR_DAYS), so a
+# product with little history starts at the old 7-day window and moves
+# towards its own rate as visits accumulate.
+#
+# Older history rows were saved by name, without a URL. Like Scraper.py,
+# those are matched by name: to the URL later scraped under the same name
+# (or given for it in a "name" column of the product list), or, failing
+# that, after the product's first fetch reveals its name.
+
+import os
+import time
+import heapq
+import argparse
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+from Scraper import fetch_all, open_history, input_file, page_cache_dir, MAX_WORKERS, REQUESTS_PER_SECOND_PER_HOST
+from page_cache import PageCache
+from cached_io import read_excel_cached
+from instrumentation import pipeline_run, stage, record
+
+CHANGES_PER_VISIT = 0.5   # Expected price changes between two visits
+PRIOR_CHANGES = 0.5       # Pseudo-observations: 0.5 changes in 7 days -> 7-day interval
+PRIOR_DAYS = 7.0
+MIN_INTERVAL_DAYS = 1.0
+MAX_INTERVAL_DAYS = 30.0
+PRICE_EPSILON = 0.005     # Price differences below half a penny are not changes
+RETRY_DELAY = timedelta(hours=1)  # Failed fetches are retried after this
+DEFAULT_BUDGET = 200      # Fetches per run (per cycle in daemon mode)
+MAX_SLEEP_SECONDS = 300   # Daemon wakes at least this often to pick up new products
+
+
+# ----------------------------------------
+# Revisit intervals from history
+# ----------------------------------------
+def revisit_interval_days(changes, span_days):
+    """Revisit interval in days for observed price changes over span_days (scalars or arrays)."""
+    rate = (np.asarray(changes, dtype=float) + PRIOR_CHANGES) / (np.asarray(span_days, dtype=float) + PRIOR_DAYS)
+    return np.clip(CHANGES_PER_VISIT / rate, MIN_INTERVAL_DAYS, MAX_INTERVAL_DAYS)
+
+
+def link_names(history, names=None):
+    """
+    Fills in the URL of older history rows saved without one, from the URL
+    scraped under the same name in later rows or, for names not seen with
+    a URL yet, from `names` (Series of product names indexed by URL).
+    """
+    h = history.reindex(columns=list(dict.fromkeys([*history.columns, "url", "name"])))
+    unlinked = h["url"].isna() & h["name"].notna()
+    if not unlinked.any():
+        return h
+    known = h.dropna(subset=["url", "name"]).drop_duplicates("name", keep="last").set_index("name")["url"]
+    if names is not None:
+        known = pd.concat([known, pd.Series(names.index, index=names.to_numpy()).dropna()])
+        known = known[~known.index.duplicated()]  # History wins over the product list
+    h.loc[unlinked, "url"] = h.loc[unlinked, "name"].map(known)
+    return h
+
+
+def price_change_stats(history, key="url"):
+    """
+    Per-product price history summary in one pass: number of price changes
+    between consecutive visits, days observed, last visit, last price and
+    the resulting revisit interval, by URL (or by `key`, e.g. "name").
+    Rows without a key or date are ignored. Works on full or change-only history.
+    """
+    h = history.reindex(columns=[key, "overall_price", "scraped_at", "last_seen_at"]).dropna(subset=[key])
+    h = h.assign(
+        scraped_at=pd.to_datetime(h["scraped_at"], errors="coerce"),
+        overall_price=pd.to_numeric(h["overall_price"], errors="coerce"),
+    ).dropna(subset=["scraped_at"]).sort_values([key, "scraped_at"], kind="stable")
+    # Change-only history: a row's visits run on to its last_seen_at
+    h["last_seen_at"] = pd.to_datetime(h["last_seen_at"], errors="coerce").fillna(h["scraped_at"])
+
+    priced = h.dropna(subset=["overall_price"])
+    previous = priced.groupby(key)["overall_price"].shift()
+    changed = (priced["overall_price"] - previous).abs() > PRICE_EPSILON
+
+    times = h.groupby(key).agg(min=("scraped_at", "min"), max=("last_seen_at", "max"))
+    stats = pd.DataFrame({
+        "changes": changed.groupby(priced[key]).sum().reindex(times.index, fill_value=0).astype(int),
+        "span_days": (times["max"] - times["min"]).dt.total_seconds() / 86400,
+        "last_scraped": times["max"],
+        "last_price": priced.groupby(key)["overall_price"].last().reindex(times.index),
+    })
+    stats["interval_days"] = revisit_interval_days(stats["changes"], stats["span_days"])
+    return stats
+
+
+# ----------------------------------------
+# Priority queue of due products
+# ----------------------------------------
+class ScrapeSchedule:
+    """
+    Min-heap of (next due time, order, url). Products never scraped are due
+    immediately, in product-list order. observe() updates a product's
+    change statistics after a fetch and queues its next visit.
+    name_stats holds history that could only be matched by name; a product
+    with no history of its own takes it over on its first fetch.
+    """
+
+    def __init__(self, urls, stats=None, now=None, name_stats=None):
+        self.stats = {}
+        self.name_stats = name_stats.to_dict("index") if name_stats is not None else {}
+        self._heap = []
+        self._order = 0
+        self.add_products(urls, stats, now)
+
+    def __len__(self):
+        return len(self._heap)
+
+    def add_products(self, urls, stats=None, now=None):
+        """Queues products not already scheduled; returns how many were added."""
+        now = now or datetime.now()
+        known = stats.to_dict("index") if stats is not None else {}
+        added = 0
+        for url in urls:
+            if url in self.stats or not isinstance(url, str):
+                continue
+            entry = known.get(url)
+            if entry is None:
+                entry = {"changes": 0, "span_days": 0.0, "last_scraped": None, "last_price": None,
+                         "interval_days": float(revisit_interval_days(0, 0))}
+                due = now
+            else:
+                entry = dict(entry, last_scraped=entry["last_scraped"].to_pydatetime())
+                due = entry["last_scraped"] + timedelta(days=entry["interval_days"])
+            self.stats[url] = entry
+            self._push(due, url)
+            added += 1
+        return added
+
+    def _push(self, due, url):
+        heapq.heappush(self._heap, (due, self._order, url))
+        self._order += 1
+
+    def next_due(self):
+        """When the earliest product is due (None if nothing is scheduled)."""
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now=None, budget=DEFAULT_BUDGET):
+        """Removes and returns up to `budget` URLs whose due time has passed, most overdue first."""
+        now = now or datetime.now()
+        urls = []
+        while self._heap and len(urls) < budget and self._heap[0][0] <= now:
+            urls.append(heapq.heappop(self._heap)[2])
+        return urls
+
+    def observe(self, url, price, when, name=None):
+        """Records a successful fetch and schedules the next visit from the updated change rate."""
+        entry = self.stats[url]
+        if entry["last_scraped"] is None and name in self.name_stats:
+            named = self.name_stats.pop(name)
+            entry.update(named, last_scraped=named["last_scraped"].to_pydatetime())
+        if entry["last_scraped"] is not None:
+            entry["span_days"] += max((when - entry["last_scraped"]).total_seconds(), 0) / 86400
+        if price is not None and not pd.isna(price):
+            last = entry["last_price"]
+            if last is not None and not pd.isna(last) and abs(price - last) > PRICE_EPSILON:
+                entry["changes"] += 1
+            entry["last_price"] = price
+        entry["last_scraped"] = when
+        entry["interval_days"] = float(revisit_interval_days(entry["changes"], entry["span_days"]))
+        self._push(when + timedelta(days=entry["interval_days"]), url)
+
+    def retry(self, url, when):
+        """Re-queues a failed fetch after RETRY_DELAY."""
+        self._push(when + RETRY_DELAY, url)
+
+
+# ----------------------------------------
+# Runs
+# ----------------------------------------
+def history_stats(store, products):
+    """
+    (stats by URL, stats by name) from the store's history, with rows saved
+    without a URL matched by name first (see link_names).
+    """
+    names = products.set_index("url")["name"] if "name" in products.columns else None
+    history = link_names(store.load(), names)
+    return price_change_stats(history), price_change_stats(history[history["url"].isna()], key="name")
+
+
+def load_schedule(store, products_path=input_file):
+    """Builds the schedule for the product list from the store's history."""
+    products = read_excel_cached(products_path)
+    stats, name_stats = history_stats(store, products)
+    schedule = ScrapeSchedule(products["url"].dropna().unique(), stats, name_stats=name_stats)
+    intervals = stats["interval_days"]
+    if len(intervals):
+        print(f"📅 {len(schedule)} products scheduled; revisit every "
+              f"{intervals.min():.1f}-{intervals.max():.1f} days (median {intervals.median():.1f})")
+    return schedule
+
+
+def run_once(schedule, store, budget=DEFAULT_BUDGET, max_workers=MAX_WORKERS,
+             per_host_rate=REQUESTS_PER_SECOND_PER_HOST, now=None):
+    """Fetches up to `budget` due products, saves the results and reschedules them. Returns rows saved."""
+    now = now or datetime.now()
+    urls = schedule.pop_due(now, budget)
+    if not urls:
+        return 0
+
+    with stage("fetch", rows_in=len(urls)) as st:
+        cache = PageCache(page_cache_dir) if page_cache_dir else None
+        fetched = fetch_all(urls, max_workers=max_workers, per_host_rate=per_host_rate, cache=cache)
+        st.rows_out = sum(result is not None for result in fetched)
+
+    done = datetime.now()
+    results = []
+    for url, result in zip(urls, fetched):
+        if result is None:
+            schedule.retry(url, done)
+            continue
+        schedule.observe(url, result["overall_price"], done, result["name"])
+        results.append(result)
+    record("schedule", due=len(urls), fetched=len(results), queued=len(schedule),
+           next_due=schedule.next_due())
+
+    if results:
+        with stage("save", rows_in=len(results)) as st:
+            store.append(pd.DataFrame(results))
+            st.rows_out = len(results)
+    return len(results)
+
+
+def main(budget=DEFAULT_BUDGET, daemon=False, max_workers=MAX_WORKERS, per_host_rate=REQUESTS_PER_SECOND_PER_HOST):
+    store = open_history()
+    schedule = load_schedule(store)
+    products_mtime = os.path.getmtime(input_file)
+
+    while True:
+        with pipeline_run("scrape_scheduler"):
+            saved = run_once(schedule, store, budget, max_workers, per_host_rate)
+        next_due = schedule.next_due()
+        print(f"✅ Saved {saved} records; next product due {next_due:%Y-%m-%d %H:%M}" if next_due
+              else f"✅ Saved {saved} records; nothing scheduled")
+        if not daemon:
+            return saved
+
+        # Pick up products added to the list since the last cycle
+        if os.path.getmtime(input_file) != products_mtime:
+            products_mtime = os.path.getmtime(input_file)
+            products = read_excel_cached(input_file)
+            stats, name_stats = history_stats(store, products)
+            schedule.name_stats = name_stats.to_dict("index")
+            added = schedule.add_products(products["url"].dropna().unique(), stats)
+            if added:
+                print(f"➕ {added} new products scheduled")
+
+        if next_due is None or next_due > datetime.now():
+            wait = MAX_SLEEP_SECONDS if next_due is None else (next_due - datetime.now()).total_seconds()
+            time.sleep(min(max(wait, 1), MAX_SLEEP_SECONDS))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scrape the products that are due, most overdue first.")
+    parser.add_argument("--budget", type=int, default=DEFAULT_BUDGET, help="Maximum fetches per run")
+    parser.add_argument("--daemon", action="store_true", help="Keep running and scrape products as they fall due")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS, help="Concurrent fetches")
+    args = parser.parse_args()
+    try:
+        main(args.budget, args.daemon, args.workers)
+    except KeyboardInterrupt:
+        print("\n👋 Scheduler stopped")
@@ -0,0 +1,103 @@
+# synthetic_data.py
+#
+# Deterministic synthetic inputs for benchmarks: raw receipt workbooks,
+# raw mock statement workbooks and product-page HTML fixtures. The same
+# size and seed always give the same data.
+
+import os
+import random
+import numpy as np
+import pandas as pd
+from excel_output import write_excel
+
+STORES = ["Tesco", "Aldi", "Lidl", "Sainsbury's", "Asda", "Co-op"]
+LOCATIONS = ["High Street", "Retail Park", "Station Road", "Market Square"]
+ITEM_WORDS = [
+    "semi skimmed milk", "cheddar", "bananas", "sourdough", "butter", "eggs", "rice", "pasta",
+    "tomatoes", "chicken breast", "yoghurt", "apples", "coffee", "tea bags", "orange juice", "oats",
+]
+ITEM_BRANDS = ["Own Brand", "Finest", "Organic", "Value", "Premium", "Farm"]
+# Cleaned states plus the ones clean_mock_frame drops
+STATEMENT_STATES = ["BOUGHT", "SOLD", "SELLING", "BUYING", "CANCELLED_BUY", "CANCELLED_SELL"]
+STATE_WEIGHTS = [0.40, 0.40, 0.06, 0.06, 0.04, 0.04]
+START_DATE = np.datetime64("2023-01-01")
+DAYS = 730
+
+
+def item_names(count, seed=0):
+    """count distinct product names such as 'Finest Cheddar 117'."""
+    rng = np.random.default_rng(seed)
+    brands = np.array(ITEM_BRANDS)[rng.integers(0, len(ITEM_BRANDS), count)]
+    words = np.array(ITEM_WORDS)[rng.integers(0, len(ITEM_WORDS), count)]
+    return [f"{brand} {word.title()} {i}" for i, (brand, word) in enumerate(zip(brands, words))]
+
+
+def _messy(names, rng):
+    """Case and whitespace variants of the same names, like hand-typed receipts."""
+    style = rng.integers(0, 4, len(names))
+    names = pd.Series(names, dtype=object)
+    names[style == 1] = names[style == 1].str.upper()
+    names[style == 2] = names[style == 2].str.lower()
+    names[style == 3] = "  " + names[style == 3] + " "
+    return names
+
+
+def _dates(rng, rows):
+    return START_DATE + rng.integers(0, DAYS, rows).astype("timedelta64[D]")
+
+
+def make_receipts(rows, items=None, seed=42):
+    """Raw receipt rows as in Receipts_database.xlsx, with a few unusable lines."""
+    rng = np.random.default_rng(seed)
+    items = items or max(rows // 50, 10)
+    names = np.array(item_names(items, seed))
+    df = pd.DataFrame({
+        "store": np.array(STORES)[rng.integers(0, len(STORES), rows)],
+        "location": np.array(LOCATIONS)[rng.integers(0, len(LOCATIONS), rows)],
+        "item": _messy(names[rng.integers(0, items, rows)], rng),
+        "price": rng.integers(30, 2000, rows) / 100,
+        "quantity": rng.integers(1, 6, rows),
+        "date": pd.Series(_dates(rng, rows)).dt.strftime("%d/%m/%Y"),
+        "productCode": pd.Series([None] * rows, dtype=object),
+    })
+    bad = rng.random(rows)
+    df.loc[bad < 0.005, "price"] = np.nan
+    df.loc[(bad >= 0.005) & (bad < 0.007), "date"] = "n/a"
+    df.loc[(bad >= 0.007) & (bad < 0.009), "quantity"] = np.nan
+    return df
+
+
+def make_statements(rows, items=None, seed=42):
+    """Raw mock 'Statements' rows, including states clean_mock_frame excludes."""
+    rng = np.random.default_rng(seed)
+    items = items or max(rows // 50, 10)
+    names = np.array(item_names(items, seed))
+    prices = rng.integers(1, 500000, rows) / 100
+    df = pd.DataFrame({
+        "name": _messy(names[rng.integers(0, items, rows)], rng),
+        "date": pd.Series(_dates(rng, rows)).dt.strftime("%d/%m/%Y"),
+        "state": rng.choice(STATEMENT_STATES, rows, p=STATE_WEIGHTS),
+        "price": [f"£{p:,.2f}" for p in prices],
+        "quantity": rng.integers(1, 1000, rows),
+    })
+    df.loc[rng.random(rows) < 0.002, "date"] = None
+    return df
+
+
+def write_receipts_workbook(path, rows, seed=42):
+    write_excel(make_receipts(rows, seed=seed), path, sheet_name="Receipts", formatting=False)
+
+
+def write_statements_workbook(path, rows, seed=42):
+    write_excel(make_statements(rows, seed=seed), path, sheet_name="Statements", formatting=False)
+
+
+def write_product_pages(fixtures_dir, count, seed=42):
+    """Writes count synthetic product pages (see bench_extraction.make_product_page)."""
+    from bench_extraction import make_product_page
+
+    rng = random.Random(seed)
+    os.makedirs(fixtures_dir, exist_ok=True)
+    for i in range(count):
+        with open(os.path.join(fixtures_dir, f"product_{i:06d}.html"), "w", encoding="utf-8") as f:
+            f.write(make_product_page(i, rng))
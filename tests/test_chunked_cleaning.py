@@ -0,0 +1,31 @@
+# tests/test_chunked_cleaning.py
+
+import pandas as pd
+from synthetic_data import write_receipts_workbook, write_statements_workbook
+from data_cleaner import FINGERPRINT_COL, RECEIPT_COLUMNS, clean_receipts, iter_load_receipts, load_receipts
+from mock_cleaner import clean_mock_statements
+
+
+def test_chunked_cleaning_matches_whole_sheet(tmp_path):
+    receipts, statements = str(tmp_path / "receipts.xlsx"), str(tmp_path / "statements.xlsx")
+    write_receipts_workbook(receipts, 2500)
+    write_statements_workbook(statements, 2500)
+    pd.testing.assert_frame_equal(clean_receipts(receipts, chunksize=400), clean_receipts(receipts))
+    pd.testing.assert_frame_equal(clean_mock_statements(statements, chunksize=400), clean_mock_statements(statements))
+
+
+def test_chunked_cleaning_of_a_header_only_sheet(tmp_path):
+    path = str(tmp_path / "empty.xlsx")
+    pd.DataFrame(columns=RECEIPT_COLUMNS).to_excel(path, index=False)
+    chunked = clean_receipts(path, chunksize=100)
+    assert chunked.empty
+    assert list(chunked.columns) == list(clean_receipts(path).columns)
+
+
+def test_chunked_fingerprints_match_whole_sheet(tmp_path):
+    path = str(tmp_path / "receipts.xlsx")
+    write_receipts_workbook(path, 2500)
+    whole = load_receipts(path)
+    assert whole["date"].isna().any()  # "n/a" cells, which read_excel reads as missing
+    chunked = pd.concat(list(iter_load_receipts(path, chunksize=400)))
+    pd.testing.assert_series_equal(chunked[FINGERPRINT_COL], whole[FINGERPRINT_COL])
@@ -0,0 +1,34 @@
+# tests/test_code_registry.py
+
+import pandas as pd
+from code_registry import CodeRegistry
+
+
+def frame(rows):
+    return pd.DataFrame(rows, columns=["store", "item_clean", "productCode"])
+
+
+def test_upsert_never_overwrites_an_assigned_code(tmp_path):
+    with CodeRegistry(str(tmp_path / "lookup.sqlite")) as registry:
+        registry.upsert_many(frame([("Tesco", "milk", 111)]))
+        registry.upsert_many(frame([("Tesco", "milk", 222), ("Tesco", "bread", 333)]))
+        assert registry.get("Tesco", "milk") == 111
+        assert registry.get("Tesco", "bread") == 333
+
+
+def test_duplicate_pairs_in_one_batch_resolve_regardless_of_order(tmp_path):
+    rows = [("Aldi", "eggs", 30), ("Aldi", "eggs", 20), ("Aldi", "eggs", 30), ("Aldi", "jam", 9), ("Aldi", "jam", 8)]
+    for i, batch in enumerate([rows, rows[::-1]]):
+        with CodeRegistry(str(tmp_path / f"lookup{i}.sqlite")) as registry:
+            registry.upsert_many(frame(batch))
+            assert registry.get("Aldi", "eggs") == 30  # Most common
+            assert registry.get("Aldi", "jam") == 8    # Tie: lowest
+
+
+def test_reassign_codes_overwrites_and_refreshes_preferred(tmp_path):
+    with CodeRegistry(str(tmp_path / "lookup.sqlite")) as registry:
+        registry.upsert_many(frame([("Tesco", "milk", 111), ("Aldi", "milk", 222), ("Lidl", "milk", 222)]))
+        assert registry.preferred("milk") == 222
+        registry.reassign_codes(frame([("Aldi", "milk", 111)]))
+        assert registry.get("Aldi", "milk") == 111
+        assert registry.preferred("milk") == 111
@@ -0,0 +1,58 @@
+# tests/test_history_store.py
+
+import pandas as pd
+from history_store import HISTORY_COLUMNS, ChangeOnlyHistoryStore, open_history_store
+from pack_units import NORMALISED_COLUMNS
+
+
+def rows(*prices, url="https://shop.example/p/1"):
+    return pd.DataFrame([
+        {"url": url, "name": "Oat milk", "pack_weight": "6 X", "overall_price": price,
+         "scraped_at": f"2026-01-0{day + 1} 09:00:00"}
+        for day, price in enumerate(prices)
+    ])
+
+
+def test_excel_store_persists_history_without_derived_columns(tmp_path):
+    store = open_history_store(str(tmp_path / "history.xlsx"))
+    store.append(rows(3.0))
+    store.append(rows(3.5))
+    assert list(pd.read_excel(tmp_path / "history.xlsx").columns) == HISTORY_COLUMNS
+
+    store.export_excel(str(tmp_path / "export.xlsx"))
+    exported = pd.read_excel(tmp_path / "export.xlsx")
+    assert set(NORMALISED_COLUMNS) <= set(exported.columns)
+    assert exported["pack_quantity"].tolist() == [6, 6]
+
+
+def test_change_only_open_converts_a_plain_sqlite_store(tmp_path):
+    path = str(tmp_path / "history.sqlite")
+    plain = open_history_store(path)
+    plain.append(pd.concat([rows(3.0, 3.0, 3.5), rows(1.0, 1.0, url="https://shop.example/p/2")]))
+    reference = ChangeOnlyHistoryStore(str(tmp_path / "reference.sqlite"))
+    reference.append(plain.load())
+
+    store = open_history_store(path, change_only=True)
+    assert len(store) == 3  # Two prices for p/1, one for p/2
+    pd.testing.assert_frame_equal(store.load(), reference.load())
+
+    # The conversion is one-off: later opens find the change-only store either way
+    assert isinstance(open_history_store(path), ChangeOnlyHistoryStore)
+    assert len(open_history_store(path, change_only=True)) == 3
+
+
+def test_cut_short_multipacks_are_not_pack_changes(tmp_path):
+    old = rows(3.0, 3.0)
+    new = rows(3.0, 3.0).assign(pack_weight="6 X 330ML", scraped_at=["2026-01-03 09:00:00", "2026-01-04 09:00:00"])
+
+    store = ChangeOnlyHistoryStore(str(tmp_path / "changes.sqlite"))
+    store.append(old)
+    store.append(new)
+    assert len(store) == 1
+    assert store.load()["pack_weight"].tolist() == ["6 X 330ML"]
+    store.append(new.assign(pack_weight="4 X 330ML", scraped_at="2026-01-05 09:00:00"))
+    assert store.load()["pack_weight"].tolist() == ["6 X 330ML", "4 X 330ML"]
+
+    plain = open_history_store(str(tmp_path / "history.sqlite"))
+    plain.append(pd.concat([old, new]))
+    assert set(plain.load()["pack_weight"]) == {"6 X 330ML"}
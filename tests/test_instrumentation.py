@@ -0,0 +1,46 @@
+# tests/test_instrumentation.py
+
+import json
+import time
+import numpy as np
+import pytest
+import instrumentation
+from instrumentation import pipeline_run, stage
+
+BIG_MB = 400
+
+
+def stage_lines(path):
+    with open(path) as f:
+        return {line["stage"]: line for line in map(json.loads, f) if line["kind"] == "stage"}
+
+
+@pytest.mark.skipif(instrumentation.rss_mb() is None, reason="needs /proc")
+def test_each_stage_reports_its_own_peak(tmp_path):
+    metrics = str(tmp_path / "metrics.jsonl")
+    with pipeline_run("test", metrics_path=metrics, profile_dir=""):
+        with stage("outer"):
+            with stage("big"):
+                buffer = np.ones(BIG_MB * 1_000_000 // 8)
+                del buffer
+            with stage("tiny"):
+                sum(range(1000))
+    lines = stage_lines(metrics)
+    big, tiny, outer = (lines[name]["peak_rss_mb"] for name in ("outer/big", "outer/tiny", "outer"))
+    assert big - tiny > BIG_MB * 0.8
+    assert outer >= big  # A parent's peak includes its children's
+
+
+@pytest.mark.skipif(instrumentation.rss_mb() is None, reason="needs /proc")
+def test_sampling_fallback_when_the_high_water_mark_cannot_be_reset(tmp_path, monkeypatch):
+    monkeypatch.setattr(instrumentation, "_hwm_resettable", False)
+    metrics = str(tmp_path / "metrics.jsonl")
+    with pipeline_run("test", metrics_path=metrics, profile_dir=""):
+        with stage("big"):
+            buffer = np.ones(BIG_MB * 1_000_000 // 8)
+            time.sleep(5 * instrumentation.SAMPLE_SECONDS)
+            del buffer
+        with stage("tiny"):
+            pass
+    lines = stage_lines(metrics)
+    assert lines["big"]["peak_rss_mb"] - lines["tiny"]["peak_rss_mb"] > BIG_MB * 0.8
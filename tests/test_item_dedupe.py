@@ -0,0 +1,32 @@
+# tests/test_item_dedupe.py
+
+import pandas as pd
+from code_registry import CodeRegistry, MOCK_STORE
+import item_dedupe
+
+
+def registry_with(path, store):
+    with CodeRegistry(str(path)) as registry:
+        registry.upsert_many(pd.DataFrame({
+            "store": [store] * 3,
+            "item_clean": ["semi skimmed milk 2l", "semi-skimmed milk 2l", "bread"],
+            "productCode": [1, 2, 3],
+        }))
+
+
+def test_apply_refreshes_the_mock_lookup_in_the_mock_layout(tmp_path):
+    registry_with(tmp_path / "mock_lookup.sqlite", MOCK_STORE)
+    item_dedupe.main([str(tmp_path / "mock_lookup.sqlite"), "--apply", "--threshold", "0.6",
+                      "--out", str(tmp_path / "proposals.xlsx")])
+    lookup = pd.read_excel(tmp_path / "mock_lookup.xlsx")
+    assert list(lookup.columns) == ["name_clean", "productCode"]
+    assert lookup.set_index("name_clean")["productCode"].to_dict() == {
+        "bread": 3, "semi skimmed milk 2l": 1, "semi-skimmed milk 2l": 1}
+    assert not (tmp_path / "item_lookup.xlsx").exists()
+
+
+def test_apply_exports_to_an_explicit_path(tmp_path):
+    registry_with(tmp_path / "codes.sqlite", "Tesco")
+    item_dedupe.main([str(tmp_path / "codes.sqlite"), "--apply", "--threshold", "0.6",
+                      "--out", str(tmp_path / "proposals.xlsx"), "--export", str(tmp_path / "lookup.xlsx")])
+    assert list(pd.read_excel(tmp_path / "lookup.xlsx").columns) == ["store", "item_clean", "productCode"]
@@ -0,0 +1,11 @@
+# tests/test_pack_units.py
+
+import pandas as pd
+from pack_units import parse_quantities
+
+
+def test_multipacks_and_bare_multipliers():
+    parsed = parse_quantities(pd.Series(["6 X 330ML", "6 X", "4PK", "500G", "2 X 6 X 330ML", "X", None]))
+    assert parsed["quantity"].tolist()[:4] == [1980.0, 6.0, 4.0, 500.0]
+    assert parsed["base_unit"].tolist()[:4] == ["ml", "each", "each", "g"]
+    assert parsed["quantity"].iloc[4:].isna().all()  # Unrecognised, left unparsed
@@ -0,0 +1,22 @@
+# tests/test_schema.py
+
+import pandas as pd
+from schema import compact_frame, concat_compact
+
+
+def test_generated_codes_compact_to_int32():
+    df = compact_frame(pd.DataFrame({"productCode": [90000001, None, 12345]}))
+    assert df["productCode"].dtype == "Int32"
+
+
+def test_ean_codes_fall_back_to_int64():
+    df = compact_frame(pd.DataFrame({"productCode": [5000112637922, None, 90000001]}))
+    assert df["productCode"].dtype == "Int64"
+    assert df["productCode"].tolist() == [5000112637922, pd.NA, 90000001]
+
+
+def test_chunks_with_and_without_ean_codes_join_as_int64():
+    chunks = [pd.DataFrame({"productCode": [90000001]}), pd.DataFrame({"productCode": ["5000112637922"]})]
+    joined = concat_compact(chunks, ignore_index=True)
+    assert joined["productCode"].dtype == "Int64"
+    assert joined["productCode"].tolist() == [90000001, 5000112637922]
@@ -0,0 +1,40 @@
+# tests/test_scrape_scheduler.py
+
+from datetime import datetime, timedelta
+import pandas as pd
+import scrape_scheduler
+from history_store import open_history_store
+
+NOW = datetime.now().replace(microsecond=0)
+
+
+def legacy_rows(name, prices, days_ago=(30, 20, 10, 2)):
+    """History saved before URLs were recorded: name only."""
+    return pd.DataFrame({"name": name, "overall_price": prices,
+                         "scraped_at": [NOW - timedelta(days=d) for d in days_ago]})
+
+
+def test_name_only_history_schedules_listed_products(tmp_path):
+    store = open_history_store(str(tmp_path / "history.sqlite"))
+    store.append(pd.concat([legacy_rows("Milk", [1.0] * 4), legacy_rows("Bread", [1.0, 2.0, 3.0, 4.0])]))
+    products = pd.DataFrame({"url": ["https://shop.example/milk", "https://shop.example/bread"],
+                             "name": ["Milk", None]})
+    products_path = str(tmp_path / "products.xlsx")
+    products.to_excel(products_path, index=False)
+
+    schedule = scrape_scheduler.load_schedule(store, products_path)
+    # Milk is matched by the product list's name; its stable price pushes the next visit out
+    assert schedule.stats["https://shop.example/milk"]["changes"] == 0
+    assert schedule.pop_due(NOW + timedelta(minutes=1)) == ["https://shop.example/bread"]
+
+    # Bread is matched by name on its first fetch and keeps its volatile history
+    schedule.observe("https://shop.example/bread", 4.5, NOW, name="Bread")
+    bread = schedule.stats["https://shop.example/bread"]
+    assert bread["changes"] == 4
+    assert bread["interval_days"] < 7
+
+
+def test_link_names_prefers_urls_seen_in_history():
+    history = pd.DataFrame({"url": [None, "https://shop.example/a"], "name": ["A", "A"]})
+    listed = pd.Series(["A"], index=["https://shop.example/other"])
+    assert scrape_scheduler.link_names(history, listed)["url"].tolist() == ["https://shop.example/a"] * 2
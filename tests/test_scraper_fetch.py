@@ -0,0 +1,123 @@
+# tests/test_scraper_fetch.py
+#
+# fetch_all against a local stand-in for the product site: an http.server
+# in a background thread that serves product pages, fails /flaky once
+# with a 503, and always fails /missing (404) and /down (503). /etag is
+# served with an ETag and answers a matching If-None-Match with a 304;
+# /stale always answers 304.
+
+import os
+import time
+import threading
+import http.server
+import socketserver
+import pytest
+from Scraper import fetch_all
+from page_cache import PageCache
+
+PAGE = """<html><body><h1 class="product-details__title">Product {name}</h1>
+<span data-test="product-details__unit-of-measurement">500G £3.00/1KG</span>
+<span class="base-price__regular">£1.50</span></body></html>"""
+
+
+class StandInHandler(http.server.BaseHTTPRequestHandler):
+    requests_seen = []  # (path, monotonic arrival time)
+    lock = threading.Lock()
+
+    def do_GET(self):
+        with self.lock:
+            self.requests_seen.append((self.path, time.monotonic()))
+            flaky_tries = sum(path == "/flaky" for path, _ in self.requests_seen)
+        if self.path == "/missing":
+            self.send_response(404)
+            self.end_headers()
+            return
+        if self.path == "/down" or (self.path == "/flaky" and flaky_tries == 1):
+            self.send_response(503)
+            self.end_headers()
+            return
+        if self.path == "/stale" or (self.path == "/etag" and self.headers.get("If-None-Match") == '"v1"'):
+            self.send_response(304)
+            self.end_headers()
+            return
+        body = PAGE.format(name=self.path.strip("/")).encode()
+        self.send_response(200)
+        if self.path == "/etag":
+            self.send_header("ETag", '"v1"')
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class StandInServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    daemon_threads = True
+
+
+@pytest.fixture
+def site():
+    StandInHandler.requests_seen = []
+    server = StandInServer(("127.0.0.1", 0), StandInHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_results_keep_input_order(site):
+    urls = [f"{site}/p{i}" for i in range(12)]
+    results = fetch_all(urls, max_workers=4, per_host_rate=0, backoff_factor=0)
+    assert [r["url"] for r in results] == urls
+    assert [r["name"] for r in results] == [f"Product p{i}" for i in range(12)]
+    assert results[0]["overall_price"] == 1.5
+    assert results[0]["pack_weight"] == "500G"
+
+
+def test_retries_503_then_succeeds(site):
+    [result] = fetch_all([f"{site}/flaky"], max_workers=1, per_host_rate=0, backoff_factor=0)
+    assert result is not None and result["name"] == "Product flaky"
+    assert [path for path, _ in StandInHandler.requests_seen] == ["/flaky", "/flaky"]
+
+
+def test_failed_urls_come_back_as_none(site):
+    urls = [f"{site}/a", f"{site}/missing", f"{site}/down", f"{site}/b"]
+    results = fetch_all(urls, max_workers=4, per_host_rate=0, retries=1, backoff_factor=0)
+    assert results[1] is None and results[2] is None
+    assert results[0]["name"] == "Product a" and results[3]["name"] == "Product b"
+
+
+def test_requests_to_one_host_are_spaced(site):
+    rate = 20.0  # One request per 50 ms
+    fetch_all([f"{site}/p{i}" for i in range(6)], max_workers=6, per_host_rate=rate, backoff_factor=0)
+    arrivals = sorted(t for _, t in StandInHandler.requests_seen)
+    gaps = [b - a for a, b in zip(arrivals, arrivals[1:])]
+    assert len(arrivals) == 6
+    assert min(gaps) >= 0.8 / rate  # Allow some scheduling jitter
+
+
+def test_not_modified_page_is_served_from_the_cache(site, tmp_path):
+    cache = PageCache(str(tmp_path / "pages"))
+    first, second = (fetch_all([f"{site}/etag"], max_workers=1, per_host_rate=0, cache=cache)[0] for _ in range(2))
+    assert first["name"] == second["name"] == "Product etag"
+    assert cache.latest(f"{site}/etag")["status"] == 304
+
+
+def test_missing_cached_copy_refetches_the_page(site, tmp_path):
+    cache = PageCache(str(tmp_path / "pages"))
+    fetch_all([f"{site}/etag"], max_workers=1, per_host_rate=0, cache=cache)
+    os.remove(cache.blob_path(cache.latest(f"{site}/etag")["sha256"]))
+
+    [result] = fetch_all([f"{site}/etag"], max_workers=1, per_host_rate=0, cache=cache)
+    assert result is not None and result["name"] == "Product etag"
+    assert [path for path, _ in StandInHandler.requests_seen] == ["/etag"] * 3  # 200, 304, full re-fetch
+    assert os.path.exists(cache.blob_path(cache.latest(f"{site}/etag")["sha256"]))
+
+
+def test_unservable_not_modified_reply_is_a_failed_url(site, tmp_path):
+    cache = PageCache(str(tmp_path / "pages"))
+    results = fetch_all([f"{site}/stale", f"{site}/a"], max_workers=2, per_host_rate=0, cache=cache)
+    assert results[0] is None
+    assert results[1]["name"] == "Product a"
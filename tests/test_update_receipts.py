@@ -0,0 +1,30 @@
+# tests/test_update_receipts.py
+
+import pandas as pd
+import update_receipt_lookup
+from data_cleaner import clean_receipts_frame
+from synthetic_data import make_receipts
+
+
+def test_dropped_rows_are_not_cleaned_again(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    raw = make_receipts(300)
+    raw.loc[:9, "price"] = None  # Unusable: cleaning drops them
+    raw.to_excel(update_receipt_lookup.RECEIPTS_FILE, index=False)
+    update_receipt_lookup.main()
+    first = pd.read_excel(update_receipt_lookup.CLEANED_FILE)
+
+    cleaned_batches = []
+    monkeypatch.setattr(update_receipt_lookup, "clean_receipts_frame",
+                        lambda df: cleaned_batches.append(len(df)) or clean_receipts_frame(df))
+    update_receipt_lookup.main()
+    update_receipt_lookup.main(chunksize=70)
+    assert cleaned_batches and sum(cleaned_batches) == 0
+    pd.testing.assert_frame_equal(pd.read_excel(update_receipt_lookup.CLEANED_FILE), first)
+
+    # An edited row is still picked up
+    raw.loc[0, "price"] = 1.25
+    raw.to_excel(update_receipt_lookup.RECEIPTS_FILE, index=False)
+    update_receipt_lookup.main()
+    assert sum(cleaned_batches) == 1
+    assert len(pd.read_excel(update_receipt_lookup.CLEANED_FILE)) == len(first) + 1
@@ -1,31 +1,163 @@
+import os
+import argparse
 import pandas as pd
-from data_cleaner import clean_receipts, create_lookup_table, merge_codes_by_item_clean
+from data_cleaner import (
+    FINGERPRINT_COL,
+    CLEANED_COLUMNS,
+    load_receipts,
+    iter_load_receipts,
+    clean_receipts_frame,
+    split_changed_receipts,
+    create_lookup_table,
+    merge_codes_by_item_clean,
+)
+from code_registry import open_registry
+from cached_io import read_excel_cached
+from excel_output import write_excel
+from rollup_store import RollupStore, aggregate_receipts
+from schema import compact_frame, concat_compact, report_memory
+from instrumentation import pipeline_run, stage
 
 RECEIPTS_FILE = "Receipts_database.xlsx"
-LOOKUP_FILE = "item_lookup.xlsx"
+LOOKUP_DB = "item_lookup.sqlite"   # Product-code registry shared by every step
+LOOKUP_FILE = "item_lookup.xlsx"   # Human-readable export (imported once if no registry yet)
 CLEANED_FILE = "Receipts_cleaned.xlsx"
+ROLLUP_DB = "receipt_rollup.sqlite"  # Monthly rollup cube read by receipt_summary.py
 
-def main():
+def main(full=False, chunksize=None):
+    """
+    Cleans and codes receipts. By default only raw rows that are new or
+    changed since the last run (by row fingerprint) are processed and merged
+    into the existing cleaned file; full=True (or --full) rebuilds everything.
+    chunksize (or --chunksize N) streams the raw sheet in chunks of N rows,
+    keeping only fingerprints and compacted cleaned rows in memory.
+    The monthly rollup is updated with the same delta (removed rows out,
+    new rows in) when it still matches the previous cleaned file.
+    Each stage is timed and logged (see instrumentation.py).
+    """
+    with pipeline_run("update_receipt_lookup"):
+        _update_receipts(full, chunksize)
+
+
+def _load_and_clean(previous, processed=None):
+    """Loads the whole raw sheet, drops rows already processed, cleans the rest."""
+    with stage("load") as st:
+        df_raw = load_receipts(RECEIPTS_FILE)
+        st.rows_out = len(df_raw)
+    report_memory(df_raw, "Raw receipts")
+    fingerprints = df_raw[FINGERPRINT_COL]
+
+    if previous is not None:
+        with stage("diff", rows_in=len(df_raw)) as st:
+            df_raw = split_changed_receipts(df_raw, previous, processed)[0]
+            st.rows_out = len(df_raw)
+
+    with stage("clean", rows_in=len(df_raw)) as st:
+        df_clean = compact_frame(clean_receipts_frame(df_raw))
+        st.rows_out = len(df_clean)
+    return fingerprints, df_clean
+
+
+def _stream_and_clean(previous, chunksize, processed=None):
+    """Like _load_and_clean, one chunk of raw rows at a time."""
+    fingerprints, raw_rows = [], 0
+
+    def cleaned_chunks():
+        nonlocal raw_rows
+        for df_raw in iter_load_receipts(RECEIPTS_FILE, chunksize=chunksize):
+            fingerprints.append(df_raw[FINGERPRINT_COL])
+            if previous is not None:
+                df_raw = split_changed_receipts(df_raw, previous, processed)[0]
+            raw_rows += len(df_raw)
+            yield clean_receipts_frame(df_raw)
+
+    with stage("load_clean") as st:
+        df_clean = concat_compact(cleaned_chunks(), columns=CLEANED_COLUMNS + [FINGERPRINT_COL])
+        st.rows_in, st.rows_out = raw_rows, len(df_clean)
+    fingerprints = pd.concat(fingerprints) if fingerprints else pd.Series([], dtype=object, name=FINGERPRINT_COL)
+    print(f"📦 Streamed {len(fingerprints)} raw receipts in chunks of {chunksize}")
+    return fingerprints, df_clean
+
+
+def _update_receipts(full, chunksize=None):
     print("=== STEP 1: Load and clean raw receipts ===")
-    df_clean = clean_receipts(RECEIPTS_FILE)
+    previous = processed = None
+    if not full and os.path.exists(CLEANED_FILE):
+        previous = read_excel_cached(CLEANED_FILE)
+        # Every raw row the last run handled, including ones cleaning dropped
+        with RollupStore(ROLLUP_DB) as rollup:
+            processed = rollup.processed_fingerprints(CLEANED_FILE)
+    if chunksize:
+        fingerprints, df_clean = _stream_and_clean(previous, chunksize, processed)
+    else:
+        fingerprints, df_clean = _load_and_clean(previous, processed)
+    raw_order = pd.Series(range(len(fingerprints)), index=fingerprints.to_numpy())
+
+    if previous is not None:
+        _, df_kept, df_removed = split_changed_receipts(fingerprints.to_frame(), previous)
+        print(f"♻️ Reusing {len(df_kept)} cleaned receipts, {len(df_removed)} changed/removed, "
+              f"{len(df_clean)} new receipts cleaned")
+    else:
+        df_kept = df_removed = None
+
     print(f"✅ Cleaned {len(df_clean)} receipts")
+    report_memory(df_clean, "Cleaned receipts")
     print(df_clean.head())
 
-    print("\n=== STEP 2: Update lookup table ===")
-    lookup_df = create_lookup_table(df_clean, lookup_path=LOOKUP_FILE)
-    print(f"✅ Lookup table now has {len(lookup_df)} entries")
-    print(lookup_df.head())
+    with open_registry(LOOKUP_DB, legacy_lookup_path=LOOKUP_FILE) as registry:
+        print("\n=== STEP 2: Update lookup table ===")
+        with stage("lookup", rows_in=len(df_clean)) as st:
+            lookup_df = create_lookup_table(df_clean, registry=registry)
+            st.rows_out = len(lookup_df)
+        print(f"✅ Lookup table now has {len(lookup_df)} entries")
+        print(lookup_df.head())
 
-    print("\n=== STEP 3: Merge lookup codes into cleaned receipts ===")
-    df_final = merge_codes_by_item_clean(df_clean, lookup_path=LOOKUP_FILE)
-    print(f"✅ Codes merged into cleaned receipts")
-    print(df_final.head())
+        print("\n=== STEP 3: Merge lookup codes into cleaned receipts ===")
+        with stage("merge", rows_in=len(df_clean)) as st:
+            df_final = merge_codes_by_item_clean(df_clean, registry=registry)
+            st.rows_out = len(df_final)
+        print(f"✅ Codes merged into cleaned receipts")
+        print(df_final.head())
+
+        with stage("export_lookup", rows_in=len(lookup_df)):
+            registry.export_excel(LOOKUP_FILE)
+
+    df_new = df_final
+    if df_kept is not None:
+        # Merge into the existing output, keeping the raw file's row order
+        df_final = pd.concat([df_kept, df_final], ignore_index=True)
+        df_final["productCode"] = pd.to_numeric(df_final["productCode"], errors="coerce").astype("Int64")
+        df_final = (
+            df_final.assign(_order=df_final[FINGERPRINT_COL].map(raw_order))
+                    .sort_values("_order", kind="stable")
+                    .drop(columns="_order")
+                    .reset_index(drop=True)
+        )
+
+    report_memory(df_final, "Coded receipts")
 
     print("\n=== STEP 4: Save cleaned receipts with codes ===")
-    with pd.ExcelWriter(CLEANED_FILE, engine="openpyxl") as writer:
-        df_final.to_excel(writer, index=False, sheet_name="Receipts")
+    with RollupStore(ROLLUP_DB) as rollup:
+        incremental = df_kept is not None and rollup.is_current(CLEANED_FILE)
+        with stage("save", rows_in=len(df_final)) as st:
+            write_excel(df_final, CLEANED_FILE, sheet_name="Receipts", formatting=False)
+            st.rows_out = len(df_final)
+
+        with stage("rollup", rows_in=len(df_new) if incremental else len(df_final)) as st:
+            if incremental:
+                rollup.subtract(aggregate_receipts(df_removed))
+                rollup.add(aggregate_receipts(df_new))
+            else:
+                rollup.rebuild(aggregate_receipts(df_final))
+            rollup.mark_current(CLEANED_FILE, fingerprints)
+            st.rows_out = len(rollup)
+        print(f"📊 Rollup {'updated' if incremental else 'rebuilt'}: {len(rollup)} item/store/month cells")
 
     print(f"🎉 All done! Cleaned receipts saved to {CLEANED_FILE}")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Clean and code receipts, then update the lookup and rollup.")
+    parser.add_argument("--full", action="store_true", help="Rebuild everything instead of the changed rows")
+    parser.add_argument("--chunksize", type=int, default=None, help="Stream the raw sheet in chunks of this many rows")
+    args = parser.parse_args()
+    main(full=args.full, chunksize=args.chunksize)
@@ -1,26 +1,46 @@
 # utils.py
 import sys
 import os
-from tkinter import Tk
-from tkinter.filedialog import askopenfilename
+import glob
+
+def has_display():
+    """False on a headless Linux/Unix box (no X11 or Wayland display to open a window on)."""
+    if sys.platform in ("win32", "darwin"):
+        return True
+    return bool(os.environ.get("DISPLAY") or os.environ.get("WAYLAND_DISPLAY"))
 
 def pick_file_gui(title="Select file", filetypes=(("All files", "*.*"),)):
-    """Opens a file picker GUI and returns the selected file path (or None)."""
+    """
+    Opens a file picker GUI and returns the selected file path (or None).
+    tkinter is only imported here, so callers that get a path never load it;
+    on a headless machine this returns None without trying.
+    """
+    if not has_display():
+        print("No display available for the file picker; pass a file path instead.")
+        return None
+    try:
+        from tkinter import Tk
+        from tkinter.filedialog import askopenfilename
+    except ImportError:
+        print("tkinter is not installed; pass a file path instead.")
+        return None
     root = Tk()
     root.withdraw()
     file_path = askopenfilename(title=title, filetypes=filetypes)
     root.destroy()
     return file_path if file_path else None
 
-def select_file():
+def select_file(path=None, use_argv=True):
     """
     Returns a valid file path:
-    1. From command line arguments if provided.
+    1. The given path, else the first command line argument if provided
+       (use_argv=False when the caller has already parsed sys.argv).
     2. Otherwise, opens a GUI file picker.
     Exits program if no valid file is selected.
     """
-    # Step 1: Check CLI argument
-    path = sys.argv[1] if len(sys.argv) > 1 else None
+    # Step 1: Check the given path / CLI argument
+    if path is None and use_argv:
+        path = sys.argv[1] if len(sys.argv) > 1 else None
 
     # Step 2: If no CLI path, open GUI
     if not path:
@@ -32,3 +52,24 @@ def select_file():
         sys.exit()
 
     return path
+
+def expand_input_paths(args, pattern="*.xlsx"):
+    """
+    Expands CLI arguments into a sorted list of files: directories give
+    their files matching `pattern`, glob patterns are expanded, plain paths
+    are kept. Excel lock files (~$...) are skipped; duplicates removed.
+    """
+    paths = []
+    for arg in args:
+        if os.path.isdir(arg):
+            paths.extend(glob.glob(os.path.join(arg, pattern)))
+        elif glob.has_magic(arg):
+            paths.extend(glob.glob(arg))
+        else:
+            paths.append(arg)
+
+    unique = {}
+    for path in paths:
+        if os.path.isfile(path) and not os.path.basename(path).startswith("~$"):
+            unique.setdefault(os.path.abspath(path), path)
+    return sorted(unique.values())